@@ -0,0 +1,144 @@
+"""
+Asynchronous crawl engine for the WebScrapper.
+
+The engine runs the requests of a WebScrapper concurrently on an asyncio event loop. The number of requests in
+flight is bounded per host and all the requests share the token bucket of the scrapper, which replaces the fixed
+pauses between pages. The blocking calls of the scrapper run in a thread pool, so the results are exactly the ones
+of ``WebScrapper.web_crawler`` and ``WebScrapper.web_access``.
+
+Example
+-------
+    scrapper = WebScrapper(start_url, rate=2, burst=4)
+    crawler = AsyncCrawler(scrapper, max_per_host=4)
+    links = crawler.web_crawler(result_pages, regex='/zoek-en-vergelijk/')
+    data = crawler.web_access(links.values())
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+class AsyncCrawler(object):
+    """
+    Runs the requests of a WebScrapper concurrently.
+
+    Parameters
+    ----------
+    scrapper : WebScrapper
+        The scrapper that downloads and parses the pages. Its ``rate_limiter`` paces all the requests.
+    max_per_host : int, default 4
+        The maximum number of requests in flight for a single host.
+    access_workers : int, default 1
+        The number of pages that ``web_access`` extracts at the same time. Pages that need a browser wait for
+        one of the ``browsers`` of the scrapper.
+
+    Attributes
+    ----------
+    failed : dict
+        The pages of the last ``web_crawler`` or ``web_access`` call that failed, with their exception. The results
+        of the other pages are returned.
+    """
+    def __init__(self, scrapper, max_per_host=4, access_workers=1):
+        self.scrapper = scrapper
+        self.max_per_host = max_per_host
+        self.access_workers = access_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_per_host + access_workers)
+        self._host_slots = {}
+        self.failed = {}
+
+    def _slots(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_slots[host]
+
+    async def _call(self, url, func, *args):
+        async with self._slots(url):
+            await self.scrapper.rate_limiter.acquire()
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _gather(self, links, calls):
+        """Runs the calls of the links and returns the results of the ones that succeeded, see failed."""
+        succeeded = []
+        for link, result in zip(links, await asyncio.gather(*calls, return_exceptions=True)):
+            if isinstance(result, Exception):
+                print('Problem with', link, result)
+                self.failed[link] = result
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                succeeded.append(result)
+        return succeeded
+
+    async def crawl_pages(self, links, regex=None):
+        """Coroutine of web_crawler."""
+        pages = await self._gather(links, [self._call(link, self.scrapper._request_page, link) for link in links])
+        found = {}
+        for html in pages:
+            found.update(self.scrapper.parse_links(html, regex))
+        return found
+
+    async def access_pages(self, links):
+        """Coroutine of web_access."""
+        workers = asyncio.Semaphore(self.access_workers)
+
+        async def access(link):
+            async with workers:
+                return await self._call(link, self.scrapper._access_page, link)
+
+        scrapped_data = {}
+        for data in await self._gather(links, [access(link) for link in links]):
+            scrapped_data.update(data)
+        return scrapped_data
+
+    def _run(self, coroutine):
+        self.failed = {}
+        loop = asyncio.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            return loop.run_until_complete(coroutine)
+        finally:
+            self._host_slots = {}
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def web_crawler(self, links, regex=None):
+        """
+        Crawls several result pages concurrently.
+
+        Parameters
+        ----------
+        links : iterable of str
+            The result pages to crawl.
+        regex : str
+            A regular expression that can be used as a search key, see WebScrapper.web_crawler.
+
+        Returns
+        -------
+        dict
+            The links of all the pages merged together. Key is the name of the links and value is the URL. The
+            pages that could not be crawled are left out and listed in ``failed``.
+        """
+        return self._run(self.crawl_pages(list(links), regex))
+
+    def web_access(self, links):
+        """
+        Extracts the content of several pages concurrently, see WebScrapper.web_access.
+
+        Parameters
+        ----------
+        links : iterable of str
+            The pages to extract.
+
+        Returns
+        -------
+        dict
+            The programs of all the pages merged together. The pages that could not be extracted are left out and
+            listed in ``failed``.
+        """
+        return self._run(self.access_pages(list(links)))
+
+    def close(self):
+        """Shuts down the thread pool of the engine."""
+        self._executor.shutdown(wait=True)
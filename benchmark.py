@@ -0,0 +1,176 @@
+"""
+Micro benchmarks for the building blocks of the scraper. Run them with ``python benchmark.py``.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from utils import ConfigDict, MappedConfig
+
+
+def bench_config_dict(total=100000, step=10000):
+    """
+    Writes ``total`` entries into a fresh ConfigDict and reports the mean cost of a write for every ``step``
+    entries. With the append-only log the cost per write should stay flat as the file grows.
+    """
+    value = str({'institute': 'Nordwin College', 'label': 'Positive', 'Details': ['Niveau', '4']})
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ConfigDict(os.path.join(tmp, 'config_file.txt'))
+        print('ConfigDict writes ({} entries)'.format(total))
+        for start in range(0, total, step):
+            begin = time.perf_counter()
+            for key in range(start, start + step):
+                store[str(key)] = value
+            elapsed = time.perf_counter() - begin
+            print('  {:>7} entries: {:.2f} us/write'.format(start + step, 1e6 * elapsed / step))
+        begin = time.perf_counter()
+        for start in range(0, total, 25):
+            store.update({str(key): value for key in range(start, start + 25)})
+        elapsed = time.perf_counter() - begin
+        print('  batched pages of 25: {:.2f} us/write'.format(1e6 * elapsed / total))
+        store.close()
+
+
+def bench_mapped_config(total=500000):
+    """Compares opening a large result file with ConfigDict and with MappedConfig (cold and with its index)."""
+    value = str({'institute': 'Nordwin College', 'label': 'Positive', 'Details': ['Niveau', '4']})
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'config_file.txt')
+        with open(filename, 'w') as fh:
+            for key in range(total):
+                fh.write('{0},{1}\n'.format(key, value))
+        print('Opening {} entries ({:.0f} MB)'.format(total, os.path.getsize(filename) / 1e6))
+        for name, opener in (('ConfigDict', ConfigDict), ('MappedConfig cold', MappedConfig),
+                             ('MappedConfig indexed', MappedConfig)):
+            begin = time.perf_counter()
+            store = opener(filename)
+            elapsed = time.perf_counter() - begin
+            begin = time.perf_counter()
+            for key in range(0, total, 97):
+                store[str(key)]
+            lookup = (time.perf_counter() - begin) / len(range(0, total, 97))
+            print('  {:<22} open {:8.1f} ms, lookup {:.2f} us'.format(name, 1e3 * elapsed, 1e6 * lookup))
+            store.close()
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'fixtures')
+REGEX = '/zoek-en-vergelijk/school/'
+
+
+def fixture(name):
+    """The HTML of a page saved in tests/fixtures."""
+    with open(os.path.join(FIXTURES, name), 'rb') as fh:
+        return fh.read()
+
+
+def soup_results(html):
+    """The BeautifulSoup implementation of WebScrapper.parse_links that page_parser replaced, as a reference."""
+    import bs4 as bs
+    soup_object = bs.BeautifulSoup(html, 'lxml')
+    soup_object.find("div", {"id": "mainResults"}).find_all("h2")[0].text
+    start_page = soup_object.a['href']
+    links = {}
+    for link, url in zip(soup_object.find_all('a', href=re.compile(REGEX)),
+                         soup_object.find_all('div', {'class': 'info'})):
+        links[url.h3.text] = start_page + link.get('href')
+    for page in soup_object.find_all('li', {'class': ['pager', 'next']}):
+        int(page.a['href'][-1])
+    return links
+
+
+def soup_school(html, tab_html):
+    """The programs of a school page with BeautifulSoup, as a reference."""
+    import bs4 as bs
+    company = bs.BeautifulSoup(html, 'lxml').find('h1', {'class': 'heading'}).text
+    tab = bs.BeautifulSoup(tab_html, 'lxml')
+    programs = {}
+    for search_result, label in zip(tab.find_all(class_='remote-accordion'), tab.find_all('div', {'class': 'l-1of4'})):
+        splited = search_result.text.split()
+        programs[splited[0]] = {'institute': company, 'label': ' '.join(label.text.split()), 'Details': splited[1:3]}
+    return programs
+
+
+def lxml_results(html):
+    import page_parser
+    links = page_parser.parse_links(html, REGEX)
+    page_parser.parse_next_page_number(html)
+    return links
+
+
+def lxml_school(html, tab_html):
+    import page_parser
+    company = page_parser.COMPANY(page_parser.parse_html(html))
+    return page_parser.parse_programs(page_parser.parse_html(tab_html), company)
+
+
+PARSERS = {'BeautifulSoup': (soup_results, soup_school), 'lxml XPath': (lxml_results, lxml_school)}
+
+
+def max_rss():
+    """The peak resident set size of the process, in kB."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kB elsewhere
+    return peak / 1024 if sys.platform == 'darwin' else peak
+
+
+def measure_parser(name, repeat):
+    """
+    Parses the fixture pages with one parser and prints the time per page and the peak RSS as JSON. It runs in a
+    process of its own, started by bench_parsers, so that the peak RSS is the one of this parser only.
+    """
+    parse_results, parse_school = PARSERS[name]
+    results, school, tab = fixture('results_page.html'), fixture('school_page.html'), fixture('programs_tab.html')
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Imports the parser before the baseline
+        parse_results(results)
+        parse_school(school, tab)
+        baseline = max_rss()
+        begin = time.perf_counter()
+        for _ in range(repeat):
+            parse_results(results)
+        results_time = (time.perf_counter() - begin) / repeat
+        begin = time.perf_counter()
+        for _ in range(repeat):
+            parse_school(school, tab)
+        school_time = (time.perf_counter() - begin) / repeat
+    print(json.dumps({'results': results_time, 'school': school_time, 'baseline': baseline, 'peak': max_rss()}))
+
+
+def bench_parsers(repeat=50):
+    """
+    Compares the time and the memory of parsing the fixture pages with BeautifulSoup and with lxml. Every parser
+    runs in a subprocess, whose peak RSS includes the trees built by libxml2 and not only the Python heap.
+    """
+    results, school, tab = fixture('results_page.html'), fixture('school_page.html'), fixture('programs_tab.html')
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert lxml_results(results) == soup_results(results)
+        assert lxml_school(school, tab) == soup_school(school, tab)
+    print('Parsing a results page of {:.0f} kB and a school page of {:.0f} kB'.format(
+        len(results) / 1e3, (len(school) + len(tab)) / 1e3))
+    for name in PARSERS:
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--parser', name,
+                                          '--repeat', str(repeat)])
+        stats = json.loads(output.decode('utf-8'))
+        print('  {:<14} results {:6.2f} ms/page, school {:6.2f} ms/page, peak RSS {:8.0f} kB ({:+.0f} kB parsing)'.format(
+            name, 1e3 * stats['results'], 1e3 * stats['school'], stats['peak'], stats['peak'] - stats['baseline']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--parser', choices=sorted(PARSERS), help='Only measures this parser, used by bench_parsers')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    if args.parser:
+        measure_parser(args.parser, args.repeat)
+    else:
+        bench_config_dict()
+        bench_mapped_config()
+        bench_parsers(args.repeat)
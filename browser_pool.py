@@ -0,0 +1,141 @@
+"""
+Pool of reusable browser sessions for the WebScrapper.
+
+Browsers are started lazily, the first time that a worker needs one, and at most ``size`` of them run at the same
+time. A worker checks a browser out, uses it and returns it to the pool. Browsers that stayed idle for too long are
+closed by a background thread, even when no worker asks for a browser anymore. Browsers that served too many pages
+are recycled, and browsers that crashed are replaced by a new one on the next checkout.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class BrowserPool(object):
+    """
+    A bounded pool of browsers created on demand.
+
+    Parameters
+    ----------
+    factory : callable
+        Creates a new browser, e.g. ``WebScrapper.create_browser``.
+    size : int, default 1
+        The maximum number of browsers running at the same time.
+    max_idle : float, default 300
+        Browsers idle for more than this number of seconds are closed, by a thread started with the first browser.
+    max_uses : int, default 200
+        Browsers are restarted after this number of checkouts, which keeps their memory in check.
+    """
+    def __init__(self, factory, size=1, max_idle=300, max_uses=200):
+        self.factory = factory
+        self.size = size
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self.started = 0
+        self.restarted = 0
+        self._idle = []
+        self._uses = {}
+        self._running = 0
+        self._condition = threading.Condition()
+        self._closed = threading.Event()
+        self._reaper = None
+
+    @staticmethod
+    def _alive(browser):
+        try:
+            browser.url
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def _quit(browser):
+        try:
+            browser.quit()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        while True:
+            with self._condition:
+                while not self._idle and self._running >= self.size:
+                    self._condition.wait()
+                if self._idle:
+                    browser, last_used = self._idle.pop()
+                else:
+                    self._running += 1
+                    browser = None
+            if browser is None:
+                try:
+                    browser = self.factory()
+                except Exception:
+                    self._release_slot()
+                    raise
+                self.started += 1
+                self._uses[id(browser)] = 0
+                return browser
+            if time.monotonic() - last_used <= self.max_idle and self._alive(browser):
+                return browser
+            self._discard(browser)
+
+    def _release_slot(self):
+        with self._condition:
+            self._running -= 1
+            self._condition.notify()
+
+    def _discard(self, browser):
+        self._uses.pop(id(browser), None)
+        self._quit(browser)
+        self._release_slot()
+
+    def _checkin(self, browser, healthy):
+        self._uses[id(browser)] += 1
+        if not healthy or self._uses[id(browser)] >= self.max_uses:
+            if not healthy:
+                self.restarted += 1
+            self._discard(browser)
+            return
+        with self._condition:
+            self._idle.append((browser, time.monotonic()))
+            self._condition.notify()
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, name='browser-pool-reaper', daemon=True)
+                self._reaper.start()
+
+    def _reap(self):
+        """Closes the browsers idle for more than max_idle seconds until the pool is closed."""
+        while not self._closed.is_set():
+            with self._condition:
+                now = time.monotonic()
+                expired = [entry for entry in self._idle if now - entry[1] > self.max_idle]
+                self._idle = [entry for entry in self._idle if now - entry[1] <= self.max_idle]
+                oldest = min((last_used for _, last_used in self._idle), default=now)
+            for browser, _ in expired:
+                self._discard(browser)
+            # Browsers returned in the meantime expire after the oldest one
+            self._closed.wait(max(oldest + self.max_idle - now, 0) + 0.01)
+
+    @contextmanager
+    def browser(self):
+        """
+        Checks a browser out of the pool for the duration of the ``with`` block. If the block fails and the browser
+        does not respond anymore, it is closed and replaced on the next checkout.
+        """
+        browser = self._checkout()
+        healthy = True
+        try:
+            yield browser
+        except Exception:
+            healthy = self._alive(browser)
+            raise
+        finally:
+            self._checkin(browser, healthy)
+
+    def close(self):
+        """Closes the idle browsers. Browsers checked out are closed when they are returned."""
+        self._closed.set()
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self.max_uses = 0
+        for browser, _ in idle:
+            self._discard(browser)
@@ -0,0 +1,118 @@
+"""
+Persistent crawl frontier.
+
+The frontier records every URL of a crawl with its state in a SQLite database on the local disk: pending,
+in flight, done or failed. Every change is committed straight away, so a crawl checkpoints after each page and
+a crawl that stopped, for any reason, resumes exactly where it was. A URL is only added once, which prevents
+scraping the same school twice.
+"""
+import sqlite3
+import threading
+import time
+
+PENDING = 'pending'
+IN_FLIGHT = 'in_flight'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class CrawlFrontier(object):
+    """
+    The queue of the URLs of a crawl, stored in SQLite.
+
+    Parameters
+    ----------
+    path : str, default 'crawl_frontier.db'
+        The database file. The state of a previous crawl is kept when it already exists.
+    max_attempts : int, default 3
+        A URL that failed this number of times is marked as failed instead of being retried.
+    """
+    def __init__(self, path='crawl_frontier.db', max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, kind TEXT NOT NULL, '
+                         'state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, error TEXT, updated REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS urls_kind_state ON urls (kind, state)')
+        self._db.commit()
+
+    def _execute(self, query, parameters=()):
+        with self._lock, self._db:
+            return self._db.execute(query, parameters).fetchall()
+
+    def add(self, urls, kind='school'):
+        """
+        Adds URLs to the pending ones. URLs that are already known, whatever their state, are ignored.
+
+        Returns
+        -------
+        int
+            The number of new URLs.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany('INSERT OR IGNORE INTO urls (url, kind, state, updated) VALUES (?, ?, ?, ?)',
+                                 [(url, kind, PENDING, now) for url in urls])
+            return self._db.total_changes - before
+
+    def claim(self, kind='school', limit=1):
+        """Moves up to ``limit`` pending URLs of a kind to in flight and returns them."""
+        with self._lock, self._db:
+            rows = self._db.execute('SELECT url FROM urls WHERE kind = ? AND state = ? ORDER BY rowid LIMIT ?',
+                                    (kind, PENDING, limit)).fetchall()
+            urls = [row[0] for row in rows]
+            self._db.executemany('UPDATE urls SET state = ?, attempts = attempts + 1, updated = ? WHERE url = ?',
+                                 [(IN_FLIGHT, time.time(), url) for url in urls])
+        return urls
+
+    def done(self, url):
+        """Marks a URL as done."""
+        self._execute('UPDATE urls SET state = ?, error = NULL, updated = ? WHERE url = ?', (DONE, time.time(), url))
+
+    def failed(self, url, error=None):
+        """Puts a URL back to pending, or marks it as failed once it has used all its attempts."""
+        self._execute('UPDATE urls SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, error = ?, updated = ? '
+                      'WHERE url = ?', (self.max_attempts, FAILED, PENDING, str(error), time.time(), url))
+
+    def release(self, url):
+        """Puts an in flight URL back to pending and gives it back the attempt of its claim, e.g. when the crawl has
+        to pause for a reason that has nothing to do with the URL."""
+        self._execute('UPDATE urls SET state = ?, attempts = MAX(attempts - 1, 0), updated = ? WHERE url = ?',
+                      (PENDING, time.time(), url))
+
+    def resume(self):
+        """Puts back to pending the URLs that were in flight when the previous crawl stopped."""
+        self._execute('UPDATE urls SET state = ? WHERE state = ?', (PENDING, IN_FLIGHT))
+
+    def retry_failed(self, kind=None):
+        """Gives the failed URLs, of a kind or all of them, a new set of attempts."""
+        query = 'UPDATE urls SET state = ?, attempts = 0 WHERE state = ?'
+        parameters = (PENDING, FAILED)
+        if kind:
+            query += ' AND kind = ?'
+            parameters += (kind,)
+        self._execute(query, parameters)
+
+    def state(self, url):
+        """The state of a URL, or None if it is not in the frontier."""
+        rows = self._execute('SELECT state FROM urls WHERE url = ?', (url,))
+        return rows[0][0] if rows else None
+
+    def counts(self, kind=None):
+        """The number of URLs, of a kind or all of them, in every state."""
+        counts = dict.fromkeys((PENDING, IN_FLIGHT, DONE, FAILED), 0)
+        if kind:
+            rows = self._execute('SELECT state, COUNT(*) FROM urls WHERE kind = ? GROUP BY state', (kind,))
+        else:
+            rows = self._execute('SELECT state, COUNT(*) FROM urls GROUP BY state')
+        counts.update(rows)
+        return counts
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._db.close()
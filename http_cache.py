@@ -0,0 +1,172 @@
+"""
+On-disk cache of the pages downloaded by the WebScrapper.
+
+Every URL is stored as two files named after the SHA-256 of the URL: the body and a small JSON file with the
+validators (ETag, Last-Modified) and the timestamps of the entry. A fresh entry is served straight from the disk.
+A stale entry is revalidated with a conditional request, so a page that did not change costs a 304 without body.
+The total size of the bodies is bounded and the least recently used entries are evicted first.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class HTTPCache(object):
+    """
+    A size-bounded LRU cache of HTTP responses on the local disk.
+
+    Parameters
+    ----------
+    directory : str, default '.http_cache'
+        The directory of the cache. It is created when it does not exist and the entries that it already holds
+        are reused.
+    ttl : float, default 7 days
+        The number of seconds during which an entry is served without asking the server.
+    max_bytes : int, default 1 GB
+        The maximum total size of the cached bodies.
+    """
+    def __init__(self, directory='.http_cache', ttl=7 * 24 * 3600, max_bytes=1024 ** 3):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+        # key -> [last use, size of the body]
+        self._entries = {}
+        self._size = 0
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                key = name[:-len('.json')]
+                try:
+                    with open(os.path.join(directory, name)) as fh:
+                        meta = json.load(fh)
+                except (IOError, ValueError):
+                    continue
+                self._entries[key] = [meta['used'], meta['size']]
+                self._size += meta['size']
+
+    @staticmethod
+    def key(url):
+        """The name of the files of a URL in the cache."""
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, key + extension)
+
+    def _read(self, key):
+        try:
+            with open(self._path(key, '.json')) as fh:
+                meta = json.load(fh)
+            with open(self._path(key, '.body'), 'rb') as fh:
+                body = fh.read()
+        except (IOError, ValueError):
+            return None, None
+        return meta, body
+
+    def _write_meta(self, key, meta):
+        tmp_path = self._path(key, '.json.tmp')
+        with open(tmp_path, 'w') as fh:
+            json.dump(meta, fh)
+        os.replace(tmp_path, self._path(key, '.json'))
+
+    def _store(self, key, url, response):
+        body = response.content
+        tmp_path = self._path(key, '.body.tmp')
+        with open(tmp_path, 'wb') as fh:
+            fh.write(body)
+        os.replace(tmp_path, self._path(key, '.body'))
+        now = time.time()
+        meta = {'url': url, 'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'stored': now, 'used': now, 'size': len(body)}
+        self._write_meta(key, meta)
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous:
+                self._size -= previous[1]
+            self._entries[key] = [now, len(body)]
+            self._size += len(body)
+        self._evict()
+
+    def _touch(self, key, meta, revalidated=False):
+        now = time.time()
+        meta['used'] = now
+        if revalidated:
+            meta['stored'] = now
+        self._write_meta(key, meta)
+        with self._lock:
+            if key in self._entries:
+                self._entries[key][0] = now
+
+    def _evict(self):
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+            victims = []
+            # Free some room so that the next stores do not evict again straight away
+            target = 0.9 * self.max_bytes
+            for key, (used, size) in sorted(self._entries.items(), key=lambda item: item[1][0]):
+                if self._size <= target:
+                    break
+                victims.append(key)
+                self._size -= size
+                del self._entries[key]
+        for key in victims:
+            for extension in ('.json', '.body'):
+                try:
+                    os.remove(self._path(key, extension))
+                except OSError:
+                    pass
+
+    def fetch(self, url, get):
+        """
+        Returns the body of a URL from the cache or from the server.
+
+        Parameters
+        ----------
+        url : str
+            The URL to download.
+        get : callable
+            Sends the request, with the same signature as ``requests.Session.get``.
+
+        Returns
+        -------
+        bytes
+            The body of the response.
+
+        Raises
+        ------
+        requests.HTTPError
+            If the server answers with an error status.
+        """
+        key = self.key(url)
+        meta, body = self._read(key) if key in self._entries else (None, None)
+        if meta is not None and time.time() - meta['stored'] < self.ttl:
+            self.hits += 1
+            self._touch(key, meta)
+            return body
+        headers = {}
+        if meta is not None:
+            if meta['etag']:
+                headers['If-None-Match'] = meta['etag']
+            if meta['last_modified']:
+                headers['If-Modified-Since'] = meta['last_modified']
+        response = get(url, headers=headers)
+        if response.status_code == 304 and meta is not None:
+            self.revalidated += 1
+            self._touch(key, meta, revalidated=True)
+            return body
+        response.raise_for_status()
+        self.misses += 1
+        self._store(key, url, response)
+        return response.content
+
+    def stats(self):
+        """The hits, revalidations (304) and misses of the cache, and the size of the stored bodies."""
+        return {'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses,
+                'entries': len(self._entries), 'bytes': self._size}
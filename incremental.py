@@ -0,0 +1,79 @@
+"""
+Change detection between crawls.
+
+The fingerprint of a school page is the hash of its heading and of the accordion sections and labels of its
+programs. The store keeps, for every page, the fingerprint and the programs of the last crawl in SQLite. A page
+whose fingerprint did not change does not need to be extracted nor persisted again, and the programs of a page that
+changed are compared with the previous ones to produce a delta: the programs added, changed and removed. The
+fingerprint of a page is only saved once its programs have been persisted.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+
+class FingerprintStore(object):
+    """
+    The fingerprints and the programs of the pages of the last crawl.
+
+    Parameters
+    ----------
+    path : str, default 'fingerprints.db'
+        The database file, kept from one crawl to the next.
+    """
+    def __init__(self, path='fingerprints.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, '
+                         'programs TEXT NOT NULL, updated REAL)')
+        self._db.commit()
+
+    def unchanged(self, url, fingerprint):
+        """
+        Returns the programs of the last crawl of a page if its fingerprint did not change, otherwise None.
+        """
+        if fingerprint is None:
+            return None
+        with self._lock:
+            row = self._db.execute('SELECT fingerprint, programs FROM pages WHERE url = ?', (url,)).fetchone()
+        if row is None or row[0] != fingerprint:
+            return None
+        return json.loads(row[1])
+
+    def delta(self, url, programs):
+        """
+        Compares the programs of a page with the ones of the last crawl.
+
+        Returns
+        -------
+        dict
+            The delta of the page: the programs ``added`` and ``changed`` (code -> program) and the codes of the
+            programs ``removed``.
+        """
+        with self._lock:
+            row = self._db.execute('SELECT programs FROM pages WHERE url = ?', (url,)).fetchone()
+        previous = json.loads(row[0]) if row else {}
+        # Compare through JSON, e.g. tuples and lists of details are equal
+        programs = json.loads(json.dumps(programs))
+        return {'url': url,
+                'added': {code: value for code, value in programs.items() if code not in previous},
+                'changed': {code: value for code, value in programs.items()
+                            if code in previous and previous[code] != value},
+                'removed': sorted(code for code in previous if code not in programs)}
+
+    def record(self, url, fingerprint, programs):
+        """
+        Saves the fingerprint and the programs of a page. Call it only once the programs have been persisted,
+        otherwise a crash in between would make the next crawl skip a page whose programs were never saved.
+        """
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO pages (url, fingerprint, programs, updated) VALUES (?, ?, ?, ?)',
+                             (url, fingerprint or '', json.dumps(programs), time.time()))
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._db.close()
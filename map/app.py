@@ -1,12 +1,17 @@
 import numpy as np
-import copy
+import os
 import pickle
 import pandas as pd
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_core_components as dcc
 import dash_html_components as html
 import dash
-from utils_map import filter_location_df, create_buttons, create_edges, create_vertices
+from utils_map import GridIndex, create_buttons, create_edges, create_vertices, index_by, viewport
+from data_store import DataStore
+from cache import from_url, memoize
+from response_cache import ResponseCache
+from figures import PERCENTAGE_AXIS, empty_figure, freeze, overlay, year_axis
 import dash_auth
 import sys
 sys.path.append("../data") # Append source directory to our Python path
@@ -17,10 +22,12 @@ mapbox_access_token = tokens[0]['MAPBOX_TOKEN']
 VALID_USERNAME_PASSWORD_PAIRS = tokens[1]
 
 STYLESHEETS = ['style.css']
+# Loaded before the Dash renderer, see static/debounce.js
+SCRIPTS = ['debounce.js']
 
 
 class CustomIndexDash(dash.Dash):
-    """Custom Dash class overriding index() method for local CSS support"""
+    """Custom Dash class overriding index() method for local CSS and JavaScript support"""
     global STYLESHEETS
 
     def _generate_css_custom_html(self):
@@ -29,10 +36,17 @@ class CustomIndexDash(dash.Dash):
         return '\n'.join(link_str.format(static_url_path, path)
                          for path in STYLESHEETS)
 
+    def _generate_scripts_custom_html(self):
+        script_str = '<script src="{}/{}"></script>'
+        static_url_path = 'static'
+        settings = '<script>window.MAP_DEBOUNCE_MS = {};</script>'.format(int(MAP_DEBOUNCE * 1000))
+        return '\n'.join([settings] + [script_str.format(static_url_path, path) for path in SCRIPTS])
+
     def index(self, *args, **kwargs):
         scripts = self._generate_scripts_html()
         css = self._generate_css_dist_html()
         custom_css = self._generate_css_custom_html()
+        custom_scripts = self._generate_scripts_custom_html()
         config = self._generate_config_html()
         title = getattr(self, 'title', 'Dash')
         return f'''
@@ -43,6 +57,7 @@ class CustomIndexDash(dash.Dash):
                 <title>{title}</title>
                 {css}
                 {custom_css}
+                {custom_scripts}
             </head>
             <body>
                 <div id="react-entry-point">
@@ -66,25 +81,50 @@ app = CustomIndexDash(
     # Serve any files that are available in the `static` folder
     static_folder='static'
 )
+# The WSGI application for gunicorn, see Procfile
+server = app.server
+
+# Load data from the memory mapped store, see build_store.py
+store = DataStore.open()
+# Cache of the figures and of the callback responses. CACHE_URL selects a backend shared by all the workers, see
+# cache.py. Without it every worker keeps FIGURE_CACHE_SIZE figures and RESPONSE_CACHE_SIZE responses in memory.
+FIGURE_CACHE_SIZE = int(os.environ.get('FIGURE_CACHE_SIZE', 4096))
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))
+CACHE_URL = os.environ.get('CACHE_URL')
+figure_cache = from_url(CACHE_URL or 'memory://?max_entries={}'.format(FIGURE_CACHE_SIZE))
+response_backend = from_url(CACHE_URL or 'memory://?max_entries={}'.format(RESPONSE_CACHE_SIZE))
+# The keys hold the version of the store, so a shared backend never serves the figures of a previous build
+CACHE_PREFIX = 'store-{}:'.format(store.version)
+# The response cache is installed before the authentication, which must run first
+response_cache = ResponseCache(app.server, response_backend, prefix=CACHE_PREFIX + 'response:')
 
 auth = dash_auth.BasicAuth(
     app,
     VALID_USERNAME_PASSWORD_PAIRS
 )
 BACKGROUND = 'rgb(240,255,240)'
-# Load data
-df = pd.read_csv('lat_lot_colleges.csv', header=0)
-df = filter_location_df(df)
-with open('dropout_per_norm.pickle', 'rb') as file:
-    drops = pickle.load(file)
-with open('dropout_reference.pickle', 'rb') as file:
-    drops_reference = pickle.load(file)
-
-labels = pd.read_csv('labels_V1.csv')
+# Whether all the figures are built at startup
+WARM_UP_FIGURES = os.environ.get('WARM_UP_FIGURES', '0') == '1'
+# 'hover' selects a college by hovering on the map, 'click' by clicking on it. In hover mode the hovers are debounced
+# in the browser: only a hover that is not followed by another one within MAP_DEBOUNCE seconds is sent to the
+# server, see static/debounce.js.
+MAP_INTERACTION = os.environ.get('MAP_INTERACTION', 'hover')
+MAP_DEBOUNCE = float(os.environ.get('MAP_DEBOUNCE', 0.25 if MAP_INTERACTION == 'hover' else 0))
+MAP_EVENT = 'clickData' if MAP_INTERACTION == 'click' else 'hoverData'
+df = store.locations()
+labels = store.labels()
+# Labels and coordinates per college, looked up in O(1) by the callbacks
+labels_per_college = index_by(labels, 'Institute', columns=['Sector', 'Final Score'],
+                              rename={'Final Score': 'Label'})
+NO_LABELS = pd.DataFrame(columns=['Sector', 'Label'])
+coordinates_per_college = {}
+for college, lat, lon in zip(df['college'], df['lat'], df['lon']):
+    # Like df[df['college'] == college].iloc[0], the first location of a college wins
+    coordinates_per_college.setdefault(college, (lat, lon))
+# Markers of the map clustered per zoom level
+college_grid = GridIndex(df['lat'], df['lon'], df['college'])
 college_options = [{'label': value, 'value': value} for key, value in df.college.to_dict().items()]
 # all_sectors = dropout_per_sector['Sector'].unique()
-with open('registered_per_norm_V2.pickle', 'rb') as file:
-    enrolled_per_year = pickle.load(file)
 
 # # Create colorscale for the different sectors
 COLORSCALE_SECTORS = {'Bovensectoraal': '#19595b', 'Voedsel, groen en gastvrijheid': '#ae3415', 'Handel': '#110303',
@@ -97,7 +137,7 @@ COLORSCALE_SECTORS = {'Bovensectoraal': '#19595b', 'Voedsel, groen en gastvrijhe
 # # Create colorscale for the different sectors
 # In[]
 # Layouts
-template_layout = dict(
+template_layout = freeze(dict(
     autosize=True,
     height=500,
     font=dict(color='#CCCCCC'),
@@ -124,7 +164,9 @@ template_layout = dict(
         ),
         zoom=7,
     )
-)
+))
+map_layout = overlay(template_layout, margin=dict(l=0, r=0, b=0, t=0))
+EMPTY_FIGURE = empty_figure(template_layout)
 
 # In[]:
 # Create app layout
@@ -150,6 +192,8 @@ app.layout = html.Div(
             ],
             className='row'
         ),
+        # The college selected on the map or in the dropdown, shared by the callbacks
+        html.Div(id='selected-college', style={'display': 'none'}),
         html.Div(
             [
                 html.Div(
@@ -317,18 +361,27 @@ def html_text(text, **kwargs):
 
 # # In[]:
 # Create callbacks
+# Map, dropdown college -> selected college. The other callbacks depend on the selected college only, so a hover
+# resolves the college once and a hover over the college already selected does not trigger them at all.
+@app.callback(Output('selected-college', 'children'),
+              [Input('simple-map', MAP_EVENT),
+               Input('college_dropdown', 'value')],
+              [State('selected-college', 'children')])
+def select_college(main_graph_hover, selection, selected):
+    college_name = exception_handler(main_graph_hover, selection)
+    # A marker of several colleges is not a college
+    if college_name == selected or (selection is None and college_name not in coordinates_per_college):
+        raise PreventUpdate()
+    return college_name
+
+
 @app.callback(
     Output('table-container', 'children'),
     [Input('category', 'value'),
-     Input('simple-map', 'hoverData'),
-     Input('college_dropdown', 'value')
+     Input('selected-college', 'children')
      ])
-def display_table(categ, main_graph_hover, selection):
-    college_name = exception_handler(main_graph_hover, selection)
-    subset = labels[labels['Institute'] == college_name]
-    subset = subset[['Sector', 'Final Score']]
-    # Change the name from Final Score to label
-    subset = subset.rename(columns={'Final Score': 'Label'})
+def display_table(categ, college_name):
+    subset = labels_per_college.get(college_name, NO_LABELS)
     if categ is None:
         pass
     if categ == 'positive':
@@ -364,41 +417,23 @@ def display_table(categ, main_graph_hover, selection):
 # Map, dropdown college -> dropdown sector
 @app.callback(
     Output('sector', 'options'),
-    [Input('simple-map', 'hoverData'),
-     Input('college_dropdown', 'value'),
-     ])
-def set_cities_options(main_graph_hover, selection):
-    college_name = exception_handler(main_graph_hover, selection)
-    try:
-        sub = drops[college_name]
-    except KeyError as e:
-        return []
-    # Dictionary to dataframe
-    sub = pd.DataFrame.from_dict(sub)
-    # List with all the sectors that will be removed
-    drop_list = []
-    # Filter out the sector with total records smaller than the threshold. Ideally all sectors should have for
-    # the whole duration 2005-2015
-    threshold = 8
-    for sector in sub.columns:
-        if sub[sector].nunique() <= threshold:
-            drop_list.append(sector)
-    sub = sub.drop(drop_list, axis=1)
-    return [{'label': key, 'value': key} for key in sub.columns]
+    [Input('selected-college', 'children')])
+def set_cities_options(college_name):
+    return sector_options(college_name)
+
+
+@memoize(figure_cache, CACHE_PREFIX + 'sector_options')
+def sector_options(college_name):
+    """The options of the sector dropdown for a college, cached per college"""
+    return [{'label': key, 'value': key} for key in store.valid_sectors(college_name)]
 
 
 # Map, dropdown college, dropdown label category->text
 @app.callback(Output('output', 'children'),
               [Input('category', 'value'),
-               Input('simple-map', 'hoverData'),
-               Input('college_dropdown', 'value')
+               Input('selected-college', 'children')
                ])
-def prepare_data(categ, main_graph_hover, selection):
-    college_name = exception_handler(main_graph_hover, selection)
-    subset = labels[labels['Institute'] == college_name]
-    subset = subset[['Sector', 'Final Score']]
-    # Change the name from Final Score to label
-    subset = subset.rename(columns={'Final Score': 'Label'})
+def prepare_data(categ, college_name):
     if categ == 'positive':
         text = 'Positive labelled sectors for {}'.format(college_name)
         layout = html_text(text, fontsize=14, color='rgb(0, 102, 51)')
@@ -412,38 +447,35 @@ def prepare_data(categ, main_graph_hover, selection):
         layout = html_text('', fontsize=14)
     return layout
 
-# Dropdown->map
+# Dropdown, zoom and pan of the map->map
 @app.callback(Output('simple-map', 'figure'),
               [
                   Input('college_dropdown', 'value'),
-                  # Input('simple-map', 'hoverData')
+                  Input('simple-map', 'relayoutData'),
               ],
 
               )
-def update_map(college_name):
-    map_layout = copy.deepcopy(template_layout)
-    map_layout['margin'] = dict(
-        l=0,
-        r=0,
-        b=0,
-        t=0)
+def update_map(college_name, relayout_data):
+    center, zoom, bbox = viewport(relayout_data, template_layout['mapbox']['center'], template_layout['mapbox']['zoom'])
+    # Keep the view of the user when the markers are updated
+    layout = overlay(map_layout, mapbox=dict(map_layout['mapbox'], center=center, zoom=zoom))
     if not college_name or college_name == []:
+        # Only the markers of the visible part of the map, points close to each other are merged into one marker
+        lat, lon, text, counts = college_grid.clusters(zoom, bbox)
         figure = dict(
             data=[dict(
-                lat=df['lat'],
-                lon=df['lon'],
-                text=df['college'],
+                lat=lat.tolist(),
+                lon=lon.tolist(),
+                text=text.tolist(),
                 type='scattermapbox',
                 hoverinfo='text',
                 selected = {'color':'red'},
-                marker=dict(size=10, opacity=10,  selectedcolor = 'red')
+                marker=dict(size=(10 + 4 * np.log2(counts)).tolist(), opacity=10,  selectedcolor = 'red')
             )],
-            layout=map_layout
+            layout=layout
         )
     else:
-        coords = df[df['college'] == college_name]
-        lat = coords['lat'].iloc[0]
-        lon = coords['lon'].iloc[0]
+        lat, lon = coordinates_per_college[college_name]
         figure = dict(
             data=[dict(
                 lat=[lat],
@@ -468,309 +500,144 @@ def update_map(college_name):
                 ]
 
             )],
-            layout=map_layout,
+            layout=layout,
         )
     return figure
 
 
 # Dropdown, hover in the map->dropout figure
 @app.callback(Output('dropout_graph', 'figure'),
-              [Input('simple-map', 'hoverData'),
-               Input('college_dropdown', 'value'),
+              [Input('selected-college', 'children'),
                Input('year--slider', 'value'),
                Input('sector', 'value')
                ])
-def update_dropout_figure(main_graph_hover, selection, year_slider, sector_drop):
-    layout_dropout_graph = copy.deepcopy(template_layout)
-    if main_graph_hover is None:
-        main_graph_hover = {
-            'points': [{'curveNumber': 0, 'pointNumber': 40, 'pointIndex': 40, 'lon': 5.801026, 'lat': 53.198069,
-                        'text': 'Nordwin College'}]}
-    if selection is None:
-        try:
-            college_name = [point['text'] for point in main_graph_hover['points']]
-            college_name = college_name[0]
-        except KeyError as e:
-            college_name = 'Nordwin College'
-    else:
-        college_name = selection
+def update_dropout_figure(college_name, year_slider, sector_drop):
+    return dropout_figure(college_name, sector_drop, year_slider)
+
+
+@memoize(figure_cache, CACHE_PREFIX + 'dropout_figure')
+def dropout_figure(college_name, sector_drop, year_slider):
+    """
+    Builds the dropout figure of a college, cached per (college, sector, year). The figure is shared by all the
+    requests and is frozen.
+    """
+    # Sectors with too few records are not offered in the dropdown, nor plotted
+    if sector_drop not in store.valid_sectors(college_name):
+        return EMPTY_FIGURE
     try:
-        sub = drops[college_name]
+        sub = store.dropout(college_name)
+        subset = sub[sector_drop].loc[:year_slider]
+        subset_ref = store.dropout_reference()[sector_drop].loc[:year_slider]
+        color = COLORSCALE_SECTORS[sector_drop]
     except KeyError as e:
-        annotation = dict(
-            text='No data available',
-            x=0.5,
-            y=0.5,
-            align="center",
-            showarrow=False,
-            xref="paper",
-            yref="paper",
-            font={'size': 20},
-        )
-        layout_dropout_graph['annotations'] = [annotation]
-        layout_dropout_graph['xaxis'] = dict(
-            autorange=True,
-            showgrid=False,
-            zeroline=False,
-            showline=False,
-            ticks='',
-            showticklabels=False,
-        )
-        layout_dropout_graph['yaxis'] = dict(
-            autorange=True,
-            showgrid=False,
-            zeroline=False,
-            showline=False,
-            ticks='',
-            showticklabels=False
-        )
-        data_drop = []
-        figure = dict(data=data_drop, layout=layout_dropout_graph)
-        return figure
-    sub = pd.DataFrame.from_dict(sub)
-    subset_ref = pd.DataFrame.from_dict(drops_reference)
-
-    # Filter out the sector with a single year record
-    drop_list = []
-    # Filter out the sector with total records smaller than the threshold. Ideally all sectors should have for
-    # the whole duration 2005-2015
-    threshold = 8
-    for sector in sub.columns:
-        if sub[sector].nunique() <= threshold:
-            drop_list.append(sector)
-    data_drop = []
-    if sector_drop:
-        try:
-            subset = sub[sector_drop].loc[:year_slider]
-            subset_ref = subset_ref[sector_drop].loc[:year_slider]
-            color = COLORSCALE_SECTORS[sector_drop]
-            data_drop = [
-                dict(
-                    type='scatter',
-                    mode='lines+markers',
-                    name=college_name,
-                    x=list(subset.index),
-                    y=list(subset.values),
-                    line=dict(
-                        shape="spline",
-                        smoothing=2,
-                        width=1,
-                        color=color
-                    ),
-                    marker=dict(symbol='diamond-open')
-                ),
-                dict(
-                    type='scatter',
-                    mode='lines+markers',
-                    name='Average of all schools',
-                    x=list(subset_ref.index),
-                    y=list(subset_ref.values),
-                    line=dict(
-                        shape="spline",
-                        smoothing=2,
-                        width=1,
-                        color='#0000cc'
-                    ),
-                    marker=dict(symbol='diamond-open')
-                ),
-            ]
-            layout_dropout_graph['title'] = '<b>Percentage change of the dropout rate <br> of the {}</b>'.format(
-                sector_drop)
-            layout_dropout_graph['showlegend'] = True
-            layout_dropout_graph['xaxis'] = dict(title='Year',  # anchor='y',
-                                                 position=0.5,
-                                                 # overlaying='y',
-                                                 side='right',
-                                                 titlefont=dict(
-                                                     size=20,
-                                                     color='#7f7f7f'
-                                                 ),
-
-                                                 tickfont=dict(
-                                                     size=14,
-                                                     color='black'
-                                                 )
-                                                 )
-            layout_dropout_graph['yaxis'] = dict(title='Percentage (%)', titlefont=dict(
-                size=20,
-                color='#7f7f7f'),
-                                                 tickfont=dict(
-                                                     size=14,
-                                                     color='black'
-                                                 )
-                                                 )
-        except KeyError as e:
-            annotation = dict(
-                text='No data available',
-                x=0.5,
-                y=0.5,
-                align="center",
-                showarrow=False,
-                xref="paper",
-                yref="paper",
-                font={'size': 20},
-            )
-            layout_dropout_graph['annotations'] = [annotation]
-            layout_dropout_graph['xaxis'] = dict(
-                autorange=True,
-                showgrid=False,
-                zeroline=False,
-                showline=False,
-                ticks='',
-                showticklabels=False,
-            )
-            layout_dropout_graph['yaxis'] = dict(
-                autorange=True,
-                showgrid=False,
-                zeroline=False,
-                showline=False,
-                ticks='',
-                showticklabels=False
-            )
-            data_drop = []
-
-    else:
-        annotation = dict(
-            text='No data available',
-            x=0.5,
-            y=0.5,
-            align="center",
-            showarrow=False,
-            xref="paper",
-            yref="paper",
-            font={'size': 20},
-        )
-        layout_dropout_graph['annotations'] = [annotation]
-        layout_dropout_graph['xaxis'] = dict(
-            autorange=True,
-            showgrid=False,
-            zeroline=False,
-            showline=False,
-            ticks='',
-            showticklabels=False,
-        )
-        layout_dropout_graph['yaxis'] = dict(
-            autorange=True,
-            showgrid=False,
-            zeroline=False,
-            showline=False,
-            ticks='',
-            showticklabels=False
-        )
-        data_drop = []
-    figure = dict(data=data_drop, layout=layout_dropout_graph)
-    return figure
+        return EMPTY_FIGURE
+    data_drop = [
+        dict(
+            type='scatter',
+            mode='lines+markers',
+            name=college_name,
+            x=list(subset.index),
+            y=list(subset.values),
+            line=dict(
+                shape="spline",
+                smoothing=2,
+                width=1,
+                color=color
+            ),
+            marker=dict(symbol='diamond-open')
+        ),
+        dict(
+            type='scatter',
+            mode='lines+markers',
+            name='Average of all schools',
+            x=list(subset_ref.index),
+            y=list(subset_ref.values),
+            line=dict(
+                shape="spline",
+                smoothing=2,
+                width=1,
+                color='#0000cc'
+            ),
+            marker=dict(symbol='diamond-open')
+        ),
+    ]
+    layout_dropout_graph = overlay(
+        template_layout,
+        title='<b>Percentage change of the dropout rate <br> of the {}</b>'.format(sector_drop),
+        showlegend=True,
+        xaxis=year_axis(0.5),
+        yaxis=PERCENTAGE_AXIS,
+    )
+    return freeze(dict(data=data_drop, layout=layout_dropout_graph))
 
 # Dropdown, hovering in the map->registered figure
 @app.callback(Output('registered_graph', 'figure'),
-              [Input('simple-map', 'hoverData'),
-               Input('college_dropdown', 'value')])
-def update_registered_figure(main_graph_hover, selection):
-    layout_registered = copy.deepcopy(template_layout)
-    if main_graph_hover is None:
-        main_graph_hover = {
-            'points': [{'curveNumber': 0, 'pointNumber': 40, 'pointIndex': 40, 'lon': 5.801026, 'lat': 53.198069,
-                        'text': 'Nordwin College'}]}
-    if selection is None:
-        try:
-            college_name = [point['text'] for point in main_graph_hover['points']]
-            college_name = college_name[0]
-        except KeyError as e:
-            college_name = 'Nordwin College'
-    else:
-        college_name = selection
+              [Input('selected-college', 'children')])
+def update_registered_figure(college_name):
+    return registered_figure(college_name)
+
+
+@memoize(figure_cache, CACHE_PREFIX + 'registered_figure')
+def registered_figure(college_name):
+    """Builds the registered students figure of a college, cached per college. The figure is frozen."""
     try:
-        subset = enrolled_per_year[college_name]
-        data = [
-            dict(
-                type='scatter',
-                mode='lines+markers',
-                name=college_name,
-                x=list(subset.keys()),
-                y=list(subset.values()),
-                line=dict(
-                    shape="spline",
-                    smoothing=2,
-                    width=1,
-                    color='#FF8C00'
-                ),
-                marker=dict(symbol='diamond-open')
+        subset = store.registered(college_name)
+        reference = store.registered('reference')
+    except KeyError as e:
+        return EMPTY_FIGURE
+    data = [
+        dict(
+            type='scatter',
+            mode='lines+markers',
+            name=college_name,
+            x=list(subset.keys()),
+            y=list(subset.values()),
+            line=dict(
+                shape="spline",
+                smoothing=2,
+                width=1,
+                color='#FF8C00'
             ),
-            dict(
-                type='scatter',
-                mode='lines+markers',
-                name='Average of all schools',
-                x=list(enrolled_per_year['reference'].keys()),
-                y=list(enrolled_per_year['reference'].values()),
-                line=dict(
-                    shape="spline",
-                    smoothing=2,
-                    width=1,
-                    color='#0000cc'
-                ),
-                marker=dict(symbol='diamond-open')
+            marker=dict(symbol='diamond-open')
+        ),
+        dict(
+            type='scatter',
+            mode='lines+markers',
+            name='Average of all schools',
+            x=list(reference.keys()),
+            y=list(reference.values()),
+            line=dict(
+                shape="spline",
+                smoothing=2,
+                width=1,
+                color='#0000cc'
             ),
-        ]
-        layout_registered['title'] = '<b>Percentage change for the registered students <br> of the {}</b>'.format(
-            college_name)
-        layout_registered['showlegend'] = True
-        layout_registered['xaxis'] = dict(title='Year',  # anchor='y',
-                                          position=0.065,
-                                          # overlaying='y',
-                                          side='right',
-                                          titlefont=dict(
-                                              size=20,
-                                              color='#7f7f7f'
-                                          ),
-
-                                          tickfont=dict(
-                                              size=14,
-                                              color='black'
-                                          )
-                                          )
-        layout_registered['yaxis'] = dict(title='Percentage (%)', titlefont=dict(
-            size=20,
-            color='#7f7f7f'),
-                                          tickfont=dict(
-                                              size=14,
-                                              color='black'
-                                          )
-                                          )
-        layout_registered['vetricalAlign'] = 'middle'
-    except KeyError as e:
-        annotation = dict(
-            text='No data available',
-            x=0.5,
-            y=0.5,
-            align="center",
-            showarrow=False,
-            xref="paper",
-            yref="paper",
-            font={'size': 20}
+            marker=dict(symbol='diamond-open')
+        ),
+    ]
+    layout_registered = overlay(
+        template_layout,
+        title='<b>Percentage change for the registered students <br> of the {}</b>'.format(college_name),
+        showlegend=True,
+        xaxis=year_axis(0.065),
+        yaxis=PERCENTAGE_AXIS,
+        vetricalAlign='middle',
+    )
+    return freeze(dict(data=data, layout=layout_registered))
 
-        )
-        layout_registered['annotations'] = [annotation]
-
-        layout_registered['xaxis'] = dict(
-            autorange=True,
-            showgrid=False,
-            zeroline=False,
-            showline=False,
-            ticks='',
-            showticklabels=False,
-        )
-        layout_registered['yaxis'] = dict(
-            autorange=True,
-            showgrid=False,
-            zeroline=False,
-            showline=False,
-            ticks='',
-            showticklabels=False
-        )
-        data = []
 
-    figure = dict(data=data, layout=layout_registered)
-    return figure
+def warm_up_figures():
+    """Builds the figures of every college, sector and year in advance, so that no hover has to build one."""
+    years = range(2005, 2016)
+    for college_name in store.colleges():
+        registered_figure(college_name)
+        for option in sector_options(college_name):
+            for year in years:
+                dropout_figure(college_name, option['value'], year)
+
+
+if WARM_UP_FIGURES:
+    warm_up_figures()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,64 @@
+"""
+Micro benchmarks of the callbacks of the dashboard. Run them with ``python benchmark_map.py`` from the directory of
+the app: like the server, they load tokens.pickle and the data store.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils_map import index_by
+
+
+def synthetic_labels(rows, colleges):
+    """A labels table like labels_V1.csv with ``rows`` rows spread over ``colleges`` colleges."""
+    random = np.random.RandomState(0)
+    return pd.DataFrame({'Institute': ['College {}'.format(i) for i in random.randint(0, colleges, rows)],
+                         'Sector': ['Sector {}'.format(i) for i in random.randint(0, 9, rows)],
+                         'Final Score': random.choice(['Positive', 'Negative'], rows)})
+
+
+class MaskLookup(object):
+    """The lookup of display_table before the labels were indexed: a mask over the whole labels table."""
+    def __init__(self, labels):
+        self.labels = labels
+
+    def get(self, college_name, default=None):
+        subset = self.labels[self.labels['Institute'] == college_name]
+        subset = subset[['Sector', 'Final Score']]
+        return subset.rename(columns={'Final Score': 'Label'})
+
+
+def time_display_table(app, names, categories):
+    """The mean time of a display_table callback, from the lookup of the college to the rendering of its table."""
+    begin = time.perf_counter()
+    for name in names:
+        for categ in categories:
+            app.display_table(categ, name)
+    return (time.perf_counter() - begin) / (len(names) * len(categories))
+
+
+def bench_display_table(sizes=(1000, 10000, 100000, 1000000), lookups=200, categories=('positive', 'negative', 'all')):
+    """Compares the latency of display_table with the mask and with the index as the labels table grows."""
+    import app
+    indexed_labels = app.labels_per_college
+    print('display_table per callback')
+    try:
+        for rows in sizes:
+            labels = synthetic_labels(rows, colleges=max(10, rows // 20))
+            names = labels['Institute'].unique()[:lookups]
+            app.labels_per_college = MaskLookup(labels)
+            mask = time_display_table(app, names, categories)
+            begin = time.perf_counter()
+            app.labels_per_college = index_by(labels, 'Institute', columns=['Sector', 'Final Score'],
+                                              rename={'Final Score': 'Label'})
+            build = time.perf_counter() - begin
+            indexed = time_display_table(app, names, categories)
+            print('  {:>8} rows: mask {:9.1f} us, index {:9.1f} us (built once in {:.0f} ms)'.format(
+                rows, 1e6 * mask, 1e6 * indexed, 1e3 * build))
+    finally:
+        app.labels_per_college = indexed_labels
+
+
+if __name__ == '__main__':
+    bench_display_table()
@@ -0,0 +1,186 @@
+"""
+Builds the columnar data store of the dashboard.
+
+The sources of the dashboard (the csv files of the colleges and of the labels and the pickles of the dropout and
+registered students) are converted into Arrow IPC files, one per table, in long format and sorted by college. An
+``index.json`` file gives the rows of every college in every table, so the app can read the data of one college
+from the memory mapped files without loading the rest. Run ``python build_store.py`` after the sources change;
+the app builds the store itself when it is missing or older than its sources.
+
+The builds take a lock file next to the store, so that the workers of the app that all find the store stale when
+they start build it once, one after the other, instead of writing over each other.
+"""
+import json
+import os
+import pickle
+import shutil
+import sys
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where the app runs a single process
+    fcntl = None
+
+from utils_map import filter_location_df
+
+LOCATIONS_CSV = 'lat_lot_colleges.csv'
+LABELS_CSV = 'labels_V1.csv'
+DROPOUT_PICKLE = 'dropout_per_norm.pickle'
+DROPOUT_REFERENCE_PICKLE = 'dropout_reference.pickle'
+REGISTERED_PICKLE = 'registered_per_norm_V2.pickle'
+SOURCES = (LOCATIONS_CSV, LABELS_CSV, DROPOUT_PICKLE, DROPOUT_REFERENCE_PICKLE, REGISTERED_PICKLE)
+STORE_DIRECTORY = 'store'
+INDEX_FILE = 'index.json'
+# A sector of a college is shown only if it has more than this number of distinct yearly values. Ideally all
+# sectors should have values for the whole duration 2005-2015.
+SECTOR_THRESHOLD = int(os.environ.get('SECTOR_THRESHOLD', 8))
+
+
+def _load_pickle(path):
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def _write_table(dataframe, path):
+    batch = pa.RecordBatch.from_pandas(dataframe.reset_index(drop=True), preserve_index=False)
+    with pa.OSFile(path, 'wb') as sink:
+        writer = pa.RecordBatchFileWriter(sink, batch.schema)
+        writer.write_batch(batch)
+        writer.close()
+
+
+def _row_ranges(dataframe, column):
+    """The first row and the number of rows of every value of a sorted column."""
+    ranges = {}
+    for position, value in enumerate(dataframe[column]):
+        if value in ranges:
+            ranges[value][1] += 1
+        else:
+            ranges[value] = [position, 1]
+    return ranges
+
+
+def _long_series(per_sector, **keys):
+    """Converts a {sector: {year: value}} dict to rows of sector, year and value."""
+    frame = pd.DataFrame.from_dict(per_sector)
+    frame.index.name = 'year'
+    frame = frame.stack().reset_index()
+    frame.columns = ['year', 'sector', 'value']
+    for name, value in keys.items():
+        frame[name] = value
+    return frame
+
+
+def _valid_sectors(dropout, threshold):
+    """The sectors of every college with more than threshold distinct values, as {college: [sector, ...]}."""
+    distinct = dropout.groupby(['college', 'sector'])['value'].nunique()
+    valid = distinct[distinct > threshold].reset_index()
+    return {college: list(rows['sector']) for college, rows in valid.groupby('college')}
+
+
+def is_stale(source_directory='.', store_directory=STORE_DIRECTORY, sector_threshold=SECTOR_THRESHOLD):
+    """True if the store is missing, older than one of its sources or built with another sector threshold."""
+    index_path = os.path.join(store_directory, INDEX_FILE)
+    if not os.path.isfile(index_path):
+        return True
+    with open(index_path) as file:
+        if json.load(file).get('sector_threshold') != sector_threshold:
+            return True
+    built = os.path.getmtime(index_path)
+    return any(os.path.getmtime(os.path.join(source_directory, name)) > built for name in SOURCES
+               if os.path.isfile(os.path.join(source_directory, name)))
+
+
+@contextmanager
+def build_lock(store_directory=STORE_DIRECTORY):
+    """Holds the lock of the builds of a store, shared by all the processes of the host."""
+    with open(store_directory.rstrip(os.sep) + '.lock', 'a') as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def build_if_stale(source_directory='.', store_directory=STORE_DIRECTORY, sector_threshold=SECTOR_THRESHOLD):
+    """
+    Builds the store if it is stale, see is_stale. A process that finds the store stale while another one builds
+    it waits for that build and then uses the new store.
+    Returns
+    -------
+    bool
+        True if the store was built by this call
+    """
+    if not is_stale(source_directory, store_directory, sector_threshold):
+        return False
+    with build_lock(store_directory):
+        if not is_stale(source_directory, store_directory, sector_threshold):
+            return False
+        _build(source_directory, store_directory, sector_threshold)
+    return True
+
+
+def build(source_directory='.', store_directory=STORE_DIRECTORY, sector_threshold=SECTOR_THRESHOLD):
+    """
+    Converts the sources of the dashboard into the data store.
+
+    Parameters
+    ----------
+    source_directory : str
+        The directory of the csv and pickle files.
+    store_directory : str
+        The directory of the store. It is written next to it first and then moved in place, so an app that
+        opens the store never sees a half written one.
+    sector_threshold : int
+        The minimum number of distinct yearly values, exclusive, of the sectors listed as valid for a college.
+    """
+    with build_lock(store_directory):
+        _build(source_directory, store_directory, sector_threshold)
+
+
+def _build(source_directory, store_directory, sector_threshold):
+    source = lambda name: os.path.join(source_directory, name)  # noqa: E731
+    locations = filter_location_df(pd.read_csv(source(LOCATIONS_CSV), header=0))
+    labels = pd.read_csv(source(LABELS_CSV)).sort_values('Institute', kind='mergesort')
+    drops = _load_pickle(source(DROPOUT_PICKLE))
+    dropout = pd.concat([_long_series(per_sector, college=college) for college, per_sector in drops.items()],
+                        ignore_index=True)
+    dropout = dropout[['college', 'sector', 'year', 'value']].sort_values('college', kind='mergesort')
+    dropout_reference = _long_series(_load_pickle(source(DROPOUT_REFERENCE_PICKLE)))
+    enrolled_per_year = _load_pickle(source(REGISTERED_PICKLE))
+    registered = pd.DataFrame([(college, year, value) for college, per_year in enrolled_per_year.items()
+                               for year, value in per_year.items()], columns=['college', 'year', 'value'])
+    registered = registered.sort_values('college', kind='mergesort')
+
+    tmp_directory = store_directory.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    _write_table(locations, os.path.join(tmp_directory, 'locations.arrow'))
+    _write_table(labels, os.path.join(tmp_directory, 'labels.arrow'))
+    _write_table(dropout, os.path.join(tmp_directory, 'dropout.arrow'))
+    _write_table(dropout_reference, os.path.join(tmp_directory, 'dropout_reference.arrow'))
+    _write_table(registered, os.path.join(tmp_directory, 'registered.arrow'))
+    index = {'labels': _row_ranges(labels.reset_index(drop=True), 'Institute'),
+             'dropout': _row_ranges(dropout.reset_index(drop=True), 'college'),
+             'registered': _row_ranges(registered.reset_index(drop=True), 'college'),
+             'valid_sectors': _valid_sectors(dropout, sector_threshold),
+             'sector_threshold': sector_threshold}
+    with open(os.path.join(tmp_directory, INDEX_FILE), 'w') as file:
+        json.dump(index, file)
+    old_directory = store_directory.rstrip(os.sep) + '.old'
+    shutil.rmtree(old_directory, ignore_errors=True)
+    if os.path.isdir(store_directory):
+        os.rename(store_directory, old_directory)
+    os.rename(tmp_directory, store_directory)
+    shutil.rmtree(old_directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    build(*sys.argv[1:3], *map(int, sys.argv[3:4]))
@@ -0,0 +1,426 @@
+"""
+Cache of the dashboard shared by the threads, and optionally the processes, of the server.
+
+Three backends are available, chosen with a URL:
+
+* ``memory://?max_entries=4096``, an LRU dict in the process. Fast, but every gunicorn worker has its own.
+* ``file:///tmp/mbo-cache?max_bytes=268435456``, pickles in a directory shared by all the workers of a host.
+* ``redis://host:6379/0?ttl=86400``, any server speaking the Redis protocol, shared by all the hosts. For a
+  single host without Redis, ``python cache.py serve`` starts a small compatible server.
+
+``memoize`` caches the results of a function in a backend, like ``functools.lru_cache``.
+"""
+import argparse
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import socket
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URL = 'memory://'
+
+
+class MemoryCache(object):
+    """
+    LRU cache in the memory of the process. The values are not copied, they must not be modified.
+    Parameters
+    ----------
+    max_entries : int
+        The number of values kept, the least recently used ones are dropped first
+    """
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """The value of a key, None if it is not cached"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileCache(object):
+    """
+    Cache of pickled values in a directory, shared by all the processes that use the same directory. A value is
+    written to a temporary file first and then moved in place, so a reader never sees a half written value.
+    Parameters
+    ----------
+    directory : str
+        The directory of the cache, created if needed
+    max_bytes : int
+        The size of the cache. Once it is exceeded the least recently read values are removed.
+    """
+    def __init__(self, directory='.dash_cache', max_bytes=256 * 1024 ** 2):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._written = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                stored_key, value = pickle.load(file)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            return None
+        if stored_key != key:
+            return None
+        # The modification time doubles as the time of the last read for the eviction
+        try:
+            os.utime(path)
+        except OSError:
+            # Evicted by another worker since it was read
+            pass
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        data = pickle.dumps((key, value), protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._written += len(data)
+            # Scanning the directory is only worth it once a tenth of the cache has been written
+            if self._written < self.max_bytes / 10:
+                return
+            self._written = 0
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(entry[1] for entry in entries)
+        if size <= self.max_bytes:
+            return
+        # Free some room so that the next writes do not evict again straight away
+        for _, entry_size, path in sorted(entries):
+            if size <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+class RespError(Exception):
+    """An error reply of a Redis compatible server"""
+
+
+def _encode_command(*args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode('utf-8')
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def _read_reply(file):
+    line = file.readline()
+    if not line:
+        raise ConnectionError('Connection closed by the server')
+    kind, payload = line[:1], line[1:-2]
+    if kind == b'+':
+        return payload.decode('utf-8')
+    if kind == b'-':
+        raise RespError(payload.decode('utf-8'))
+    if kind == b':':
+        return int(payload)
+    if kind == b'$':
+        length = int(payload)
+        if length < 0:
+            return None
+        return file.read(length + 2)[:-2]
+    if kind == b'*':
+        length = int(payload)
+        if length < 0:
+            return None
+        return [_read_reply(file) for _ in range(length)]
+    raise RespError('Unknown reply {!r}'.format(line))
+
+
+class RedisCache(object):
+    """
+    Cache of pickled values in a server speaking the Redis protocol (RESP), with one connection per thread.
+    The cache is an optimisation: when the server can not be reached, get misses and set does nothing. After a
+    failure the server is left alone for ``retry_after`` seconds, so that the callbacks do not wait for a
+    connection timeout on every call while it is down.
+    Parameters
+    ----------
+    host, port : str, int
+        The address of the server
+    db : int
+        The Redis database
+    ttl : int
+        The number of seconds a value is kept, forever if None
+    prefix : str
+        Prefix of the keys, to share a server with other applications
+    timeout : float
+        The timeout of the socket, in seconds
+    retry_after : float
+        The number of seconds the server is skipped after a failure
+    """
+    def __init__(self, host='127.0.0.1', port=6379, db=0, ttl=None, prefix='mbo:', timeout=1.0, retry_after=5.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.ttl = ttl
+        self.prefix = prefix
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._down_until = 0.0
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = self._local.connection = (sock, sock.makefile('rb'))
+            if self.db:
+                self._send(connection, 'SELECT', self.db)
+        return connection
+
+    @staticmethod
+    def _send(connection, *args):
+        sock, file = connection
+        sock.sendall(_encode_command(*args))
+        return _read_reply(file)
+
+    def command(self, *args):
+        """Sends a command to the server and returns its reply"""
+        try:
+            return self._send(self._connection(), *args)
+        except (OSError, ConnectionError):
+            # Drop the connection, the next command opens a new one
+            self.close()
+            raise
+
+    def _safe_command(self, *args):
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            return self.command(*args)
+        except RespError as e:
+            logger.warning('Cache server {}:{} failed: {}'.format(self.host, self.port, e))
+            return None
+        except (OSError, ConnectionError) as e:
+            logger.warning('Cache server {}:{} failed, skipped for {}s: {}'.format(self.host, self.port,
+                                                                                   self.retry_after, e))
+            self._down_until = time.monotonic() + self.retry_after
+            return None
+
+    def get(self, key):
+        data = self._safe_command('GET', self.prefix + key)
+        return None if data is None else pickle.loads(data)
+
+    def set(self, key, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.ttl:
+            self._safe_command('SET', self.prefix + key, data, 'EX', self.ttl)
+        else:
+            self._safe_command('SET', self.prefix + key, data)
+
+    def delete(self, key):
+        self._safe_command('DEL', self.prefix + key)
+
+    def clear(self):
+        self._safe_command('FLUSHDB')
+
+    def close(self):
+        """Closes the connection of the current thread"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            self._local.connection = None
+            connection[1].close()
+            connection[0].close()
+
+
+def from_url(url=None):
+    """
+    Creates the backend described by a URL, see the module docstring.
+    Parameters
+    ----------
+    url : str
+        The URL of the backend, the CACHE_URL environment variable or memory:// if None
+    Returns
+    -------
+    object
+        The backend
+    """
+    url = url or os.environ.get('CACHE_URL', DEFAULT_URL)
+    parsed = urlparse(url)
+    options = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+    if parsed.scheme == 'memory':
+        return MemoryCache(max_entries=int(options.get('max_entries', 4096)))
+    if parsed.scheme == 'file':
+        return FileCache(parsed.netloc + parsed.path or '.dash_cache',
+                         max_bytes=int(options.get('max_bytes', 256 * 1024 ** 2)))
+    if parsed.scheme == 'redis':
+        ttl = options.get('ttl')
+        return RedisCache(parsed.hostname or '127.0.0.1', parsed.port or 6379,
+                          db=int(parsed.path.strip('/') or 0), ttl=int(ttl) if ttl else None,
+                          prefix=options.get('prefix', 'mbo:'), retry_after=float(options.get('retry_after', 5.0)))
+    raise ValueError('Unknown cache backend {}'.format(url))
+
+
+def memoize(backend, prefix=None):
+    """
+    Caches the results of a function in a backend, keyed by the name of the function and the repr of its
+    arguments. The arguments must have a stable repr, like the strings and numbers of the callbacks.
+    None is never cached, since it stands for a miss.
+    Parameters
+    ----------
+    backend : object
+        The backend, see from_url
+    prefix : str
+        The prefix of the keys, the qualified name of the function if None. Change it when the results of the
+        function change, so that a shared backend does not serve the results of an older version.
+    """
+    def decorator(function):
+        key_prefix = prefix or '{}.{}'.format(function.__module__, function.__qualname__)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = '{}{!r}{!r}'.format(key_prefix, args, sorted(kwargs.items()))
+            value = backend.get(key)
+            if value is None:
+                value = function(*args, **kwargs)
+                if value is not None:
+                    backend.set(key, value)
+            return value
+        wrapper.cache = backend
+        return wrapper
+    return decorator
+
+
+class _StandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                command = _read_reply(self.rfile)
+            except (ConnectionError, RespError, ValueError):
+                return
+            if not isinstance(command, list) or not command:
+                self.wfile.write(b'-ERR expected a command\r\n')
+                continue
+            self.wfile.write(self.server.execute(command[0].decode('utf-8').upper(), command[1:]))
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    """
+    A small server speaking the Redis protocol, for hosts without Redis. It supports PING, SELECT, GET, SET with
+    EX, DEL, DBSIZE and FLUSHDB, keeps everything in memory, and drops the least recently used keys beyond
+    max_entries.
+    Parameters
+    ----------
+    address : tuple
+        The host and port to listen on
+    max_entries : int
+        The number of keys kept
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 6379), max_entries=65536):
+        socketserver.ThreadingTCPServer.__init__(self, address, _StandInHandler)
+        self.store = MemoryCache(max_entries)
+
+    def execute(self, name, args):
+        """Runs a command and returns the encoded reply"""
+        if name == 'PING':
+            return b'+PONG\r\n'
+        if name == 'SELECT':
+            return b'+OK\r\n'
+        if name == 'GET' and len(args) == 1:
+            entry = self.store.get(args[0])
+            if entry is None or (entry[1] is not None and entry[1] < time.monotonic()):
+                return b'$-1\r\n'
+            return b'$%d\r\n%s\r\n' % (len(entry[0]), entry[0])
+        if name == 'SET' and len(args) in (2, 4):
+            expires = None
+            if len(args) == 4:
+                if args[2].upper() != b'EX':
+                    return b'-ERR syntax error\r\n'
+                expires = time.monotonic() + int(args[3])
+            self.store.set(args[0], (args[1], expires))
+            return b'+OK\r\n'
+        if name == 'DEL':
+            deleted = 0
+            for key in args:
+                if self.store.get(key) is not None:
+                    self.store.delete(key)
+                    deleted += 1
+            return b':%d\r\n' % deleted
+        if name == 'DBSIZE':
+            return b':%d\r\n' % len(self.store)
+        if name == 'FLUSHDB':
+            self.store.clear()
+            return b'+OK\r\n'
+        return '-ERR unknown command {}\r\n'.format(name).encode('utf-8')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Redis compatible cache server for the dashboard')
+    parser.add_argument('role', choices=['serve'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    parser.add_argument('--max-entries', type=int, default=65536)
+    args = parser.parse_args()
+    server = StandInServer((args.host, args.port), args.max_entries)
+    print('Serving the cache on {}:{}'.format(args.host, args.port))
+    server.serve_forever()
@@ -0,0 +1,101 @@
+"""
+Read access to the columnar data store of the dashboard, see build_store.
+
+The Arrow files of the store are opened lazily and memory mapped: the operating system shares their pages among
+all the worker processes of the app, and only the rows of the college that a callback asks for are converted to
+pandas.
+"""
+import json
+import os
+import threading
+
+import pyarrow as pa
+
+import build_store
+
+
+class DataStore(object):
+    """
+    The tables of the dashboard, indexed by college.
+
+    Parameters
+    ----------
+    directory : str
+        The directory of the store, as written by ``build_store.build``.
+    """
+    def __init__(self, directory=build_store.STORE_DIRECTORY):
+        self.directory = directory
+        self._batches = {}
+        self._index = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, directory=build_store.STORE_DIRECTORY, source_directory='.',
+             sector_threshold=build_store.SECTOR_THRESHOLD):
+        """Opens the store, building it first if it is missing, older than its sources or has another threshold."""
+        build_store.build_if_stale(source_directory, directory, sector_threshold)
+        return cls(directory)
+
+    @property
+    def index(self):
+        if self._index is None:
+            with open(os.path.join(self.directory, build_store.INDEX_FILE)) as file:
+                self._index = json.load(file)
+        return self._index
+
+    @property
+    def version(self):
+        """The build time of the store, which changes whenever the store is rebuilt"""
+        return int(os.path.getmtime(os.path.join(self.directory, build_store.INDEX_FILE)))
+
+    def _batch(self, name):
+        with self._lock:
+            if name not in self._batches:
+                source = pa.memory_map(os.path.join(self.directory, name + '.arrow'), 'r')
+                self._batches[name] = pa.RecordBatchFileReader(source).get_batch(0)
+            return self._batches[name]
+
+    def _rows(self, name, key):
+        """The rows of a college in a table as a DataFrame. Raises KeyError if the college has none."""
+        start, length = self.index[name][key]
+        return self._batch(name).slice(start, length).to_pandas()
+
+    def table(self, name):
+        """A whole table of the store as a DataFrame."""
+        return self._batch(name).to_pandas()
+
+    def locations(self):
+        """The colleges with their coordinates, as in lat_lot_colleges.csv."""
+        return self.table('locations')
+
+    def labels(self):
+        """The labelled sectors of all the colleges, as in labels_V1.csv."""
+        return self.table('labels')
+
+    def colleges(self, name='dropout'):
+        """The colleges that have rows in a table."""
+        return list(self.index[name])
+
+    def dropout(self, college):
+        """
+        The dropout rates of a college as a DataFrame with the years as index and the sectors as columns, like
+        ``pd.DataFrame.from_dict(drops[college])``. Raises KeyError if the college has no data.
+        """
+        rows = self._rows('dropout', college)
+        return rows.pivot(index='year', columns='sector', values='value')
+
+    def valid_sectors(self, college):
+        """
+        The sectors of a college with enough dropout data to be plotted, i.e. with more distinct yearly values than
+        the sector threshold of the store. Empty if the college has no data.
+        """
+        return self.index['valid_sectors'].get(college, [])
+
+    def dropout_reference(self):
+        """The average dropout rates of all the schools, with the years as index and the sectors as columns."""
+        return self.table('dropout_reference').pivot(index='year', columns='sector', values='value')
+
+    def registered(self, college):
+        """The registered students of a college as a {year: value} dict. Raises KeyError if it has no data."""
+        rows = self._rows('registered', college)
+        return dict(zip(rows['year'], rows['value']))
@@ -0,0 +1,105 @@
+"""Immutable layout templates shared by the figures of the dashboard"""
+
+
+class FrozenDict(dict):
+    """
+    A dict that can not be modified after its creation. Being a dict, it is serialised like any other part of a
+    figure, but a callback that would modify a shared template by mistake raises instead of changing the figures
+    of all the other requests.
+    """
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('{} is immutable, use overlay() to derive a new one'.format(type(self).__name__))
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+def freeze(value):
+    """
+    Makes an immutable copy of a layout.
+    Parameters
+    ----------
+    value : object
+        A dict, list or value of a plotly figure
+    Returns
+    -------
+    object
+        The value with all the nested dicts turned into FrozenDict and the lists into tuples
+    """
+    if isinstance(value, FrozenDict):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def overlay(base, **fields):
+    """
+    Derives a new layout from a template by replacing some of its top level fields. The other fields are not
+    copied but shared with the template, which is why the templates are immutable.
+    Parameters
+    ----------
+    base : FrozenDict
+        The template
+    fields
+        The fields to add or replace
+    Returns
+    -------
+    FrozenDict
+        The new layout
+    """
+    layout = dict(base)
+    layout.update((key, freeze(value)) for key, value in fields.items())
+    return FrozenDict(layout)
+
+
+# Axis of an empty figure, without grid, line nor ticks
+HIDDEN_AXIS = freeze(dict(
+    autorange=True,
+    showgrid=False,
+    zeroline=False,
+    showline=False,
+    ticks='',
+    showticklabels=False,
+))
+
+NO_DATA_ANNOTATION = freeze(dict(
+    text='No data available',
+    x=0.5,
+    y=0.5,
+    align="center",
+    showarrow=False,
+    xref="paper",
+    yref="paper",
+    font={'size': 20},
+))
+
+AXIS_TITLE_FONT = freeze(dict(size=20, color='#7f7f7f'))
+AXIS_TICK_FONT = freeze(dict(size=14, color='black'))
+
+PERCENTAGE_AXIS = freeze(dict(title='Percentage (%)', titlefont=AXIS_TITLE_FONT, tickfont=AXIS_TICK_FONT))
+
+
+def year_axis(position):
+    """The x axis of the time series, placed at position"""
+    return freeze(dict(title='Year', position=position, side='right', titlefont=AXIS_TITLE_FONT,
+                       tickfont=AXIS_TICK_FONT))
+
+
+def empty_figure(layout):
+    """The figure shown when there is nothing to plot, built on a layout template"""
+    return freeze(dict(
+        data=[],
+        layout=overlay(layout, annotations=[NO_DATA_ANNOTATION], xaxis=HIDDEN_AXIS, yaxis=HIDDEN_AXIS),
+    ))
@@ -0,0 +1,134 @@
+"""Cache of the compressed responses of the dashboard callbacks"""
+import functools
+import gzip
+import hashlib
+import json
+import threading
+
+from flask import make_response, request
+
+from cache import MemoryCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+UPDATE_COMPONENT = '_dash-update-component'
+
+
+class ResponseCache(object):
+    """
+    Keeps the responses of the Dash callbacks, compressed once per entry.
+
+    The callbacks of the dashboard are pure functions of their inputs, so the response of a callback request can be
+    reused for any request with the same body. The entries are keyed by the sha1 of the body, which holds the
+    output, the inputs and the state of the callback. Every entry keeps the JSON and its gzip encoding, and its
+    brotli encoding when the brotli package is installed, and the client gets the smallest one it accepts. The sha1
+    of the JSON is sent as ETag, so a client that revalidates gets a 304 without a body.
+
+    The entries are kept in a backend of cache.py, by default in the memory of the process, or in a backend shared by
+    all the workers of the server.
+
+    The cache wraps the view of the callbacks, it has to be installed before dash_auth so that a cached response
+    is only served once the request has been authorized.
+
+    Parameters
+    ----------
+    server : flask.Flask
+        The server of the Dash app
+    backend : object
+        The backend of the entries, see cache.from_url. An LRU of 1024 entries in memory if None.
+    prefix : str
+        The prefix of the keys in the backend
+    exclude : iterable
+        The ids of the outputs that are never cached, e.g. outputs of callbacks with side effects
+    min_size : int
+        Responses smaller than this are not compressed
+    compress_level : int
+        The gzip level, the responses are compressed only once so the highest level is cheap
+    """
+    def __init__(self, server, backend=None, prefix='response:', exclude=(), min_size=500, compress_level=9):
+        self.backend = backend if backend is not None else MemoryCache(1024)
+        self.prefix = prefix
+        self.exclude = set(exclude)
+        self.min_size = min_size
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        endpoints = [name for name in server.view_functions if name.endswith(UPDATE_COMPONENT)]
+        if not endpoints:
+            raise ValueError('The server has no {} view, create the Dash app first'.format(UPDATE_COMPONENT))
+        for endpoint in endpoints:
+            server.view_functions[endpoint] = self._cached(server.view_functions[endpoint])
+
+    def _cached(self, view):
+        @functools.wraps(view)
+        def cached_view(*args, **kwargs):
+            body = request.get_data()
+            if self._excluded(body):
+                return view(*args, **kwargs)
+            key = self.prefix + hashlib.sha1(body).hexdigest()
+            entry = self.get(key)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                # Prevented updates, errors and anything else than a figure or a value are not cached
+                if response.status_code != 200:
+                    return response
+                entry = self._entry(response.get_data(), response.mimetype)
+                self.set(key, entry)
+            return self._respond(entry)
+        return cached_view
+
+    def _excluded(self, body):
+        if not self.exclude:
+            return False
+        try:
+            output = json.loads(body.decode('utf-8'))['output']
+        except (ValueError, KeyError, TypeError):
+            return True
+        return output.get('id') in self.exclude
+
+    def _entry(self, data, mimetype):
+        entry = {'etag': hashlib.sha1(data).hexdigest(), 'mimetype': mimetype, 'identity': data}
+        if len(data) >= self.min_size:
+            entry['gzip'] = gzip.compress(data, self.compress_level)
+            if brotli is not None:
+                entry['br'] = brotli.compress(data)
+        return entry
+
+    def _respond(self, entry):
+        if entry['etag'] in request.if_none_match:
+            response = make_response('', 304)
+        else:
+            encoding = 'identity'
+            for candidate in ('br', 'gzip'):
+                if candidate in entry and candidate in request.accept_encodings:
+                    encoding = candidate
+                    break
+            response = make_response(entry[encoding])
+            response.mimetype = entry['mimetype']
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(entry['etag'])
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def get(self, key):
+        """The cached entry of a request, None if it is not cached"""
+        entry = self.backend.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, key, entry):
+        """Caches the entry of a request"""
+        self.backend.set(key, entry)
+
+    def stats(self):
+        """The number of hits and misses of the cache"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,53 @@
+/*
+ * Debounces the callback requests that select a college, in the browser.
+ *
+ * Sweeping the mouse over the map fires a hover for every marker on the way. Every hover is a request to
+ * _dash-update-component for the selected-college output. This wraps window.fetch so that such a request is only
+ * sent if no newer one follows within window.MAP_DEBOUNCE_MS milliseconds. The superseded requests never reach the
+ * server: they resolve with a 204, which the Dash renderer ignores like a prevented update.
+ */
+(function () {
+    var originalFetch = window.fetch;
+    if (!originalFetch) {
+        return;
+    }
+    var DEBOUNCED_OUTPUT = 'selected-college';
+    var pending = null;
+
+    function isDebounced(url, options) {
+        if (!(window.MAP_DEBOUNCE_MS > 0) || !options || options.method !== 'POST' ||
+            String(url).indexOf('_dash-update-component') === -1 || typeof options.body !== 'string') {
+            return false;
+        }
+        try {
+            var output = JSON.parse(options.body).output;
+            // {id, property} for the older renderers, "id.property" for the newer ones
+            var id = typeof output === 'string' ? output.split('.')[0] : output.id;
+            return id === DEBOUNCED_OUTPUT;
+        } catch (e) {
+            return false;
+        }
+    }
+
+    window.fetch = function (url, options) {
+        if (!isDebounced(url, options)) {
+            return originalFetch.apply(this, arguments);
+        }
+        var self = this;
+        var args = arguments;
+        if (pending !== null) {
+            clearTimeout(pending.timer);
+            pending.resolve(new Response(null, {status: 204}));
+        }
+        return new Promise(function (resolve, reject) {
+            var request = {resolve: resolve};
+            request.timer = setTimeout(function () {
+                if (pending === request) {
+                    pending = null;
+                }
+                originalFetch.apply(self, args).then(resolve, reject);
+            }, window.MAP_DEBOUNCE_MS);
+            pending = request;
+        });
+    };
+})();
@@ -0,0 +1,5 @@
+"""Makes the modules of the dashboard importable by the tests, like they are by app.py."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
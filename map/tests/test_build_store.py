@@ -0,0 +1,65 @@
+import os
+import pickle
+import threading
+import time
+
+import build_store
+from data_store import DataStore
+
+YEARS = range(2005, 2016)
+
+
+def write_sources(directory):
+    with open(os.path.join(directory, build_store.LOCATIONS_CSV), 'w') as file:
+        file.write('college,lat,lon,BRIN\nNova,52.38,4.63,B01\nAlfa,53.21,6.56,B02\n')
+    with open(os.path.join(directory, build_store.LABELS_CSV), 'w') as file:
+        file.write('Institute,Sector,Final Score\nNova,Handel,Positive\nAlfa,Techniek,Negative\nNova,Zorg,Negative\n')
+    series = {'Handel': {year: year - 2000.0 for year in YEARS}, 'Zorg': {2010: 1.0}}
+    for name, data in ((build_store.DROPOUT_PICKLE, {'Nova': series, 'Alfa': series}),
+                       (build_store.DROPOUT_REFERENCE_PICKLE, series),
+                       (build_store.REGISTERED_PICKLE, {'Nova': {2015: 120}, 'Alfa': {2015: 80}})):
+        with open(os.path.join(directory, name), 'wb') as file:
+            pickle.dump(data, file)
+
+
+def test_the_store_is_built_once_by_the_workers_that_find_it_stale(tmpdir, monkeypatch):
+    write_sources(str(tmpdir))
+    store_directory = str(tmpdir.join('store'))
+    builds = []
+    build = build_store._build
+
+    def slow_build(*args):
+        builds.append(args)
+        time.sleep(0.2)
+        build(*args)
+    monkeypatch.setattr(build_store, '_build', slow_build)
+    stores, errors = [], []
+
+    def open_store():
+        try:
+            stores.append(DataStore.open(store_directory, str(tmpdir), sector_threshold=8))
+        except Exception as e:
+            errors.append(e)
+    workers = [threading.Thread(target=open_store) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert errors == []
+    assert len(builds) == 1
+    assert [store.valid_sectors('Nova') for store in stores] == [['Handel']] * 4
+    assert sorted(os.listdir(str(tmpdir.join('store')))) == sorted(
+        ['dropout.arrow', 'dropout_reference.arrow', 'index.json', 'labels.arrow', 'locations.arrow',
+         'registered.arrow'])
+
+
+def test_a_store_is_rebuilt_when_its_sources_change(tmpdir):
+    write_sources(str(tmpdir))
+    store_directory = str(tmpdir.join('store'))
+    assert build_store.build_if_stale(str(tmpdir), store_directory, 8)
+    assert not build_store.build_if_stale(str(tmpdir), store_directory, 8)
+    assert build_store.build_if_stale(str(tmpdir), store_directory, 3)
+    later = time.time() + 10
+    os.utime(str(tmpdir.join(build_store.LABELS_CSV)), (later, later))
+    assert build_store.build_if_stale(str(tmpdir), store_directory, 3)
+    assert list(DataStore(store_directory).labels()['Institute']) == ['Alfa', 'Nova', 'Nova']
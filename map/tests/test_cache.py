@@ -0,0 +1,132 @@
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+import cache
+from cache import FileCache, MemoryCache, RedisCache, RespError, StandInServer, from_url, memoize
+
+
+@pytest.fixture
+def server():
+    server = StandInServer(('127.0.0.1', 0), max_entries=100)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def redis(server):
+    backend = RedisCache(*server.server_address, prefix='test:')
+    yield backend
+    backend.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_memory_cache_drops_the_least_recently_used_values():
+    backend = MemoryCache(max_entries=2)
+    backend.set('a', 1)
+    backend.set('b', 2)
+    backend.get('a')
+    backend.set('c', 3)
+    assert (backend.get('a'), backend.get('b'), backend.get('c')) == (1, None, 3)
+
+
+def test_file_cache_evicts_the_least_recently_read_values(tmpdir):
+    backend = FileCache(str(tmpdir), max_bytes=2000)
+    for number in range(20):
+        backend.set('key{}'.format(number), 'x' * 200)
+        time.sleep(0.01)
+    assert backend.get('key19') == 'x' * 200
+    assert backend.get('key0') is None
+    assert sum(os.path.getsize(entry.path) for entry in os.scandir(str(tmpdir))) <= 2000
+
+
+def test_file_cache_misses_the_values_removed_by_another_process(tmpdir):
+    backend = FileCache(str(tmpdir))
+    backend.set('a', [1, 2])
+    assert FileCache(str(tmpdir)).get('a') == [1, 2]
+    FileCache(str(tmpdir)).delete('a')
+    assert backend.get('a') is None
+
+
+def test_redis_cache_through_the_stand_in_server(server, redis):
+    assert redis.command('PING') == 'PONG'
+    redis.set('a', {'figure': [1, 2]})
+    assert redis.get('a') == {'figure': [1, 2]}
+    assert server.store.get(b'test:a') is not None
+    redis.delete('a')
+    assert redis.get('a') is None
+    redis.set('b', 1)
+    assert redis.command('DBSIZE') == 1
+    redis.clear()
+    assert redis.command('DBSIZE') == 0
+    with pytest.raises(RespError):
+        redis.command('HGETALL', 'b')
+
+
+def test_the_stand_in_server_expires_values(server):
+    backend = RedisCache(*server.server_address, ttl=1)
+    backend.set('a', 1)
+    assert backend.get('a') == 1
+    entry = server.store.get(b'mbo:a')
+    server.store.set(b'mbo:a', (entry[0], time.monotonic() - 1))
+    assert backend.get('a') is None
+    backend.close()
+
+
+def test_an_unreachable_server_is_skipped_for_a_while(monkeypatch):
+    connections = []
+
+    def create_connection(*args, **kwargs):
+        connections.append(args)
+        raise ConnectionRefusedError('refused')
+    monkeypatch.setattr(cache.socket, 'create_connection', create_connection)
+    backend = RedisCache('127.0.0.1', free_port(), retry_after=0.2)
+    assert backend.get('a') is None
+    backend.set('a', 1)
+    assert backend.get('a') is None
+    assert len(connections) == 1
+    time.sleep(0.25)
+    assert backend.get('a') is None
+    assert len(connections) == 2
+
+
+def test_the_server_is_used_again_once_it_is_back(server):
+    backend = RedisCache('127.0.0.1', free_port(), retry_after=0.1)
+    assert backend.get('a') is None
+    backend.port = server.server_address[1]
+    backend.set('a', 1)
+    assert backend.get('a') is None
+    time.sleep(0.15)
+    backend.set('a', 1)
+    assert backend.get('a') == 1
+    backend.close()
+
+
+def test_from_url_creates_the_backends(tmpdir):
+    assert isinstance(from_url('memory://?max_entries=10'), MemoryCache)
+    assert from_url('file://{}?max_bytes=100'.format(tmpdir)).max_bytes == 100
+    backend = from_url('redis://cache.local:6380/2?ttl=60&retry_after=1')
+    assert (backend.host, backend.port, backend.db, backend.ttl, backend.retry_after) == ('cache.local', 6380, 2, 60, 1)
+    with pytest.raises(ValueError):
+        from_url('memcached://localhost')
+
+
+def test_memoize_caches_the_results_but_not_none():
+    calls = []
+
+    @memoize(MemoryCache())
+    def square(number):
+        calls.append(number)
+        return number * number if number else None
+    assert [square(3), square(3), square(0), square(0)] == [9, 9, None, None]
+    assert calls == [3, 0, 0]
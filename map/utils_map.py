@@ -25,6 +25,133 @@ def filter_location_df(df):
     return dff
 
 
+class GridIndex(object):
+    """
+    Spatial index of the colleges for the map. For every zoom level the points are grouped in the cells of a grid
+    whose cells get smaller as the zoom grows, and each group is drawn as a single marker at its centroid. A
+    viewport then only ever holds a bounded number of markers, however many points there are.
+    Parameters
+    ----------
+    lat, lon : array-like
+        The coordinates of the points
+    names : array-like
+        The names of the points, shown on hover when a marker holds a single point
+    cells_per_tile : int
+        The number of cells along the side of a 512px map tile, i.e. markers are at least 512 / cells_per_tile
+        pixels apart
+    min_zoom, max_zoom : int
+        The zoom levels for which the clusters are computed. Beyond max_zoom every point is its own marker.
+    """
+    def __init__(self, lat, lon, names, cells_per_tile=8, min_zoom=3, max_zoom=14):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.names = np.asarray(names, dtype=object)
+        self.cells_per_tile = cells_per_tile
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self._levels = {zoom: self._cluster(zoom) for zoom in range(min_zoom, max_zoom + 1)}
+
+    def cell_size(self, zoom):
+        """The side of the cells at a zoom level, in degrees of longitude"""
+        return 360.0 / (2 ** zoom) / self.cells_per_tile
+
+    def _cluster(self, zoom):
+        size = self.cell_size(zoom)
+        keys = np.stack([np.floor(self.lat / size), np.floor(self.lon / size)], axis=1)
+        _, cluster, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+        lat = np.bincount(cluster, weights=self.lat) / counts
+        lon = np.bincount(cluster, weights=self.lon) / counts
+        # A marker that holds a single point keeps the exact position and the name of the point
+        first = np.full(len(counts), -1)
+        first[cluster[::-1]] = np.arange(len(cluster))[::-1]
+        single = counts == 1
+        lat[single] = self.lat[first[single]]
+        lon[single] = self.lon[first[single]]
+        text = np.where(single, self.names[first], ['{} colleges'.format(count) for count in counts])
+        return lat, lon, text, counts
+
+    def clusters(self, zoom, bbox=None):
+        """
+        The markers of a zoom level inside a bounding box.
+        Parameters
+        ----------
+        zoom : float
+            The zoom of the map
+        bbox : tuple
+            (south, west, north, east) in degrees, all the markers if None
+        Returns
+        -------
+        tuple
+            The lat, lon, text and number of points of the markers
+        """
+        zoom = int(min(max(round(zoom), self.min_zoom), self.max_zoom))
+        lat, lon, text, counts = self._levels[zoom]
+        if bbox is not None:
+            south, west, north, east = bbox
+            inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+            lat, lon, text, counts = lat[inside], lon[inside], text[inside], counts[inside]
+        return lat, lon, text, counts
+
+
+def viewport(relayout_data, center, zoom, width=1024, height=600):
+    """
+    The center, zoom and approximate bounding box of the map from the relayoutData of the graph.
+    Parameters
+    ----------
+    relayout_data : dict
+        The relayoutData of the map, or None before any interaction
+    center : dict
+        The default center, with lat and lon
+    zoom : float
+        The default zoom
+    width, height : int
+        An upper bound of the size of the map in pixels, the bounding box is rather too large than too small
+    Returns
+    -------
+    tuple
+        The center, the zoom and the (south, west, north, east) bounding box
+    """
+    relayout_data = relayout_data or {}
+    mapbox = relayout_data.get('mapbox') or {}
+    center = relayout_data.get('mapbox.center') or mapbox.get('center') or center
+    zoom = relayout_data.get('mapbox.zoom', mapbox.get('zoom', zoom))
+    degrees_per_pixel = 360.0 / (512 * 2 ** zoom)
+    half_width = degrees_per_pixel * width / 2
+    half_height = degrees_per_pixel * height / 2 * np.cos(np.radians(center['lat']))
+    bbox = (center['lat'] - half_height, center['lon'] - half_width,
+            center['lat'] + half_height, center['lon'] + half_width)
+    return center, zoom, bbox
+
+
+def index_by(dataframe, key, columns=None, rename=None):
+    """
+    Splits a dataframe into one dataframe per value of a column, so that the rows of a value are found in O(1)
+    instead of with a boolean mask over the whole table.
+    Parameters
+    ----------
+    dataframe : pd.DataFrame
+        The table to split
+    key : str
+        The column whose values are the keys of the index
+    columns : list
+        The columns kept in the dataframes, all by default
+    rename : dict
+        The columns to rename in the dataframes
+    Returns
+    -------
+    dict
+        The dataframe of the rows of every value of the column
+    """
+    index = {}
+    for value, group in dataframe.groupby(key, sort=False):
+        if columns is not None:
+            group = group[columns]
+        if rename:
+            group = group.rename(columns=rename)
+        index[value] = group
+    return index
+
+
 def create_vertices(subset, college_name, criteria=None):
     # Axis limits of the graph and x coordinate of the top level of the tree
     x_axis_min = 1
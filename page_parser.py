@@ -0,0 +1,150 @@
+"""
+Fast extraction of the data of the inspectorate pages.
+
+The pages are parsed once with lxml and the elements are selected with XPath expressions compiled at import time.
+The functions return exactly what the BeautifulSoup based methods of the WebScrapper used to return, without
+building a soup of the whole page.
+"""
+import hashlib
+import re
+from lxml import etree
+
+_PARSER = etree.HTMLParser()
+_PAGE_NUMBER = re.compile(r'pagina=(\d+)')
+_RESULT_COUNT = re.compile(r'\d[\d.]*')
+
+
+def _has_class(name):
+    return 'contains(concat(" ", normalize-space(@class), " "), " {} ")'.format(name)
+
+
+RESULTS_TITLE = etree.XPath('string((//div[@id="mainResults"]//h2)[1])')
+START_PAGE = etree.XPath('(//a)[1]/@href')
+LINKS = etree.XPath('//a[@href]')
+INFO_NAMES = etree.XPath('//div[{}]'.format(_has_class('info')))
+FIRST_H3 = etree.XPath('string((.//h3)[1])')
+PAGER = etree.XPath('//li[{} or {}]/a[1]/@href'.format(_has_class('pager'), _has_class('next')))
+COMPANY = etree.XPath('string(//h1[{}])'.format(_has_class('heading')))
+TAB_LINK = etree.XPath('//*[@id="tabs"]/ul/li[2]/a/@href')
+# jQuery UI adds the ui-* classes in the browser, the HTML sent by the server only has remote-accordion
+ACCORDIONS = etree.XPath('.//*[{}]'.format(_has_class('remote-accordion')))
+LABELS = etree.XPath('.//div[@class="l-1of4"]')
+
+
+def parse_html(html):
+    """Parses a page (bytes or str) and returns the root element, or None when the page is empty."""
+    if not html:
+        return None
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+    return etree.fromstring(html, _PARSER)
+
+
+def element_text(element):
+    """The text of an element and of its descendants, like the ``text`` of a soup tag."""
+    return ''.join(element.itertext())
+
+
+def parse_links(html, regex=None):
+    """
+    Extracts the links of a results page.
+
+    Parameters
+    ----------
+    html : bytes or str
+        The HTML of the page.
+    regex : str
+        If given, only the links whose URL matches the regular expression are kept and named after the title
+        of their result. Otherwise all the links are kept and named after their text.
+
+    Returns
+    -------
+    dict
+        Key is the name of the links and value is the URL.
+    """
+    root = parse_html(html)
+    print(RESULTS_TITLE(root))
+    start_page = START_PAGE(root)[0]
+    links = {}
+    if regex:
+        pattern = re.compile(regex)
+        anchors = (anchor for anchor in LINKS(root) if pattern.search(anchor.get('href')))
+        for anchor, info in zip(anchors, INFO_NAMES(root)):
+            links[FIRST_H3(info)] = start_page + anchor.get('href')
+    else:
+        for anchor in LINKS(root):
+            links[element_text(anchor)] = start_page + anchor.get('href')
+    return links
+
+
+def parse_next_page_number(html):
+    """Returns the number of the next page announced by the pager of a results page, or None."""
+    next_page_number = None
+    for href in PAGER(parse_html(html)):
+        match = _PAGE_NUMBER.search(href)
+        next_page_number = int(match.group(1)) if match else int(href[-1])
+    return next_page_number
+
+
+def parse_result_count(html):
+    """
+    Reads the total number of results and the number of results per page from the first results page.
+
+    Returns
+    -------
+    tuple of int
+        The total number of results (None if the title has no number) and the number of results on the page.
+    """
+    root = parse_html(html)
+    match = _RESULT_COUNT.search(RESULTS_TITLE(root))
+    # The title uses a dot as thousands separator, e.g. "1.234 resultaten"
+    total = int(match.group(0).replace('.', '')) if match else None
+    return total, len(INFO_NAMES(root))
+
+
+def parse_programs(root, company):
+    """
+    Extracts the programs of the second tab of a school page.
+
+    Parameters
+    ----------
+    root : lxml element
+        The tab, or the page that contains it.
+    company : str
+        The name of the school.
+
+    Returns
+    -------
+    dict
+        Key is the code of the program, value the institute, its label and its details.
+    """
+    scrapped_data = {}
+    for search_result, label in zip(ACCORDIONS(root), LABELS(root)):
+        splited = element_text(search_result).split()
+        if not splited:
+            continue
+        label = ' '.join(element_text(label).split())
+        scrapped_data[splited[0]] = {'institute': company, 'label': label, 'Details': splited[1:3]}
+    return scrapped_data
+
+
+def fingerprint(company, tab):
+    """
+    The fingerprint of a school page: the hash of its name and of the text of the accordion sections and of the
+    labels of its tab, i.e. of everything parse_programs extracts.
+
+    Returns None when the tab could not be loaded or has no programs, in which case the page has to be extracted:
+    the programs of such a page are only found by the browser, and the hash of the tab would not see them change.
+    """
+    if tab is None:
+        return None
+    texts = [(kind, [' '.join(element_text(element).split()) for element in elements])
+             for kind, elements in ((b'\1', ACCORDIONS(tab)), (b'\2', LABELS(tab)))]
+    if not any(texts[0][1]) or not texts[1][1]:
+        return None
+    digest = hashlib.sha256((company or '').encode('utf-8'))
+    for kind, elements in texts:
+        for text in elements:
+            digest.update(kind)
+            digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
@@ -0,0 +1,95 @@
+"""
+Columnar store of the scraped programs.
+
+The results of every school page are written as a partition: an Arrow IPC file with the typed columns program
+code, institute, label and details (a list of strings). Partitions are written atomically, one per page, so a
+crawl can be stopped at any time. ``read_results`` memory maps the partitions and concatenates them without
+copying, e.g. for the dashboard, instead of parsing the ``str(dict)`` lines of the text results file.
+"""
+import hashlib
+import os
+
+import pyarrow as pa
+
+SCHEMA = pa.schema([
+    pa.field('program_code', pa.string()),
+    pa.field('institute', pa.string()),
+    pa.field('label', pa.string()),
+    pa.field('details', pa.list_(pa.string())),
+])
+
+
+def to_record_batch(scrapped_data):
+    """Converts the dict returned by WebScrapper.web_access to a record batch of the results schema."""
+    codes = list(scrapped_data)
+    columns = [
+        pa.array(codes, type=pa.string()),
+        pa.array([scrapped_data[code]['institute'] for code in codes], type=pa.string()),
+        pa.array([scrapped_data[code]['label'] for code in codes], type=pa.string()),
+        pa.array([list(scrapped_data[code]['Details']) for code in codes], type=pa.list_(pa.string())),
+    ]
+    return pa.RecordBatch.from_arrays(columns, [field.name for field in SCHEMA])
+
+
+class ResultsWriter(object):
+    """
+    Writes the programs of every page to its own partition.
+
+    Parameters
+    ----------
+    directory : str, default 'results'
+        The directory of the partitions. It is created when it does not exist.
+    """
+    def __init__(self, directory='results'):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def partition_path(self, key):
+        """The file of the partition of a page, named after the hash of its URL."""
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.arrow')
+
+    def write(self, key, scrapped_data):
+        """
+        Writes the programs of a page. Writing the same page again replaces its partition.
+
+        Parameters
+        ----------
+        key : str
+            The URL of the page.
+        scrapped_data : dict
+            The programs of the page, as returned by WebScrapper.web_access.
+        """
+        path = self.partition_path(key)
+        tmp_path = path + '.tmp'
+        batch = to_record_batch(scrapped_data)
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            writer = pa.RecordBatchFileWriter(sink, SCHEMA)
+            writer.write_batch(batch)
+            writer.close()
+        os.replace(tmp_path, path)
+
+    def close(self):
+        """Nothing to release, every partition is closed once it is written."""
+
+
+def read_results(directory='results'):
+    """
+    Reads all the partitions of a directory.
+
+    The files are memory mapped, so the columns of the returned table point to the page cache of the operating
+    system instead of being copied, and processes that read the same partitions share the memory.
+
+    Returns
+    -------
+    pyarrow.Table
+        The programs of all the pages.
+    """
+    batches = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.arrow'):
+            continue
+        reader = pa.RecordBatchFileReader(pa.memory_map(os.path.join(directory, name), 'r'))
+        batches.extend(reader.get_batch(i) for i in range(reader.num_record_batches))
+    if not batches:
+        batches = [to_record_batch({})]
+    return pa.Table.from_batches(batches)
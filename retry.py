@@ -0,0 +1,190 @@
+"""
+Retry policy of the requests of the WebScrapper.
+
+Transient failures (connection errors, timeouts, 429 and 5xx answers) are retried with an exponential backoff and
+full jitter, honouring the Retry-After header of the server. Two safeguards keep the retries from making an
+overloaded server worse: a retry budget, which caps the retries to a share of the requests, and a circuit breaker
+per host, which stops sending requests to a host that keeps failing and lets a single request through once it has
+cooled down.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """
+    Raised when a request is not sent because the circuit breaker of its host is open. ``retry_after`` is the
+    number of seconds until the circuit lets a request through again.
+    """
+    def __init__(self, *args, retry_after=0.0, **kwargs):
+        super(CircuitOpenError, self).__init__(*args, **kwargs)
+        self.retry_after = retry_after
+
+
+class RetryPolicy(object):
+    """
+    Sends requests and retries them when they fail for a transient reason.
+
+    Parameters
+    ----------
+    max_retries : int, default 3
+        The maximum number of retries of a request.
+    backoff : float, default 0.5
+        The base delay in seconds; the n-th retry waits a random time up to ``backoff * 2 ** n``.
+    max_backoff : float, default 60
+        The maximum delay before a retry, Retry-After included.
+    retry_statuses : tuple, default (429, 500, 502, 503, 504)
+        The HTTP statuses that are retried.
+    budget : float, default 0.2
+        The retries may not exceed this share of the requests sent...
+    min_budget : int, default 10
+        ...plus this number of retries, so that the first failures of a crawl can be retried.
+    failure_threshold : int, default 5
+        The number of consecutive failed requests to a host that opens its circuit.
+    reset_timeout : float, default 60
+        The number of seconds during which an open circuit rejects the requests.
+    """
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=60, retry_statuses=(429, 500, 502, 503, 504),
+                 budget=0.2, min_budget=10, failure_threshold=5, reset_timeout=60):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = frozenset(retry_statuses)
+        self.budget = budget
+        self.min_budget = min_budget
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        # host -> [consecutive failures, time at which the circuit opened]
+        self._circuits = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Starts counting the requests and the retries from zero, e.g. at the start of a crawl."""
+        with self._lock:
+            self.requests = 0
+            self.retries = 0
+            self.failures = 0
+            self.rejected = 0
+            self.budget_exhausted = 0
+            self.backoff_seconds = 0.0
+
+    def stats(self):
+        """The requests sent, the retries spent and the requests that failed or were rejected by a circuit."""
+        with self._lock:
+            return {'requests': self.requests, 'retries': self.retries, 'failures': self.failures,
+                    'rejected': self.rejected, 'budget_exhausted': self.budget_exhausted,
+                    'backoff_seconds': round(self.backoff_seconds, 3),
+                    'open_circuits': sorted(host for host, (_, opened) in self._circuits.items() if opened)}
+
+    def _allow(self, host):
+        with self._lock:
+            failures, opened = self._circuits.get(host, (0, None))
+            if opened is None:
+                return True
+            if time.monotonic() - opened >= self.reset_timeout:
+                # Half open: let this request through, a failure opens the circuit again
+                self._circuits[host] = [failures, time.monotonic() + self.reset_timeout]
+                return True
+            self.rejected += 1
+            return False
+
+    def open_for(self, url):
+        """The number of seconds until the circuit of the host of a URL lets a request through, 0 if it is closed."""
+        with self._lock:
+            _, opened = self._circuits.get(urlsplit(url).netloc, (0, None))
+            if opened is None:
+                return 0.0
+            return max(0.0, opened + self.reset_timeout - time.monotonic())
+
+    def _record(self, host, success):
+        with self._lock:
+            if success:
+                self._circuits.pop(host, None)
+                return
+            self.failures += 1
+            circuit = self._circuits.setdefault(host, [0, None])
+            circuit[0] += 1
+            if circuit[0] >= self.failure_threshold:
+                circuit[1] = time.monotonic()
+
+    def _take_retry(self):
+        with self._lock:
+            if self.retries >= self.budget * self.requests + self.min_budget:
+                self.budget_exhausted += 1
+                return False
+            self.retries += 1
+            return True
+
+    def _delay(self, attempt, response):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(max(delay, 0.0), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def call(self, url, send, max_retries=None):
+        """
+        Sends a request, retrying it when it fails for a transient reason.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the request, its host selects the circuit breaker.
+        send : callable
+            Sends the request and returns its response.
+        max_retries : int, default None
+            Overrides the maximum number of retries of the policy for this request.
+
+        Returns
+        -------
+        requests.Response
+            The first response that is not retried, or the last one when the retries are exhausted.
+
+        Raises
+        ------
+        CircuitOpenError
+            If the circuit of the host is open.
+        requests.ConnectionError, requests.Timeout
+            If the last attempt failed without a response.
+        """
+        host = urlsplit(url).netloc
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            if not self._allow(host):
+                raise CircuitOpenError('Too many failures for {}, not sending {}'.format(host, url),
+                                       retry_after=self.open_for(url))
+            with self._lock:
+                self.requests += 1
+            response = error = None
+            try:
+                response = send()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if error is None and response.status_code not in self.retry_statuses:
+                self._record(host, success=True)
+                return response
+            self._record(host, success=False)
+            if attempt >= max_retries or not self._take_retry():
+                if error is not None:
+                    raise error
+                return response
+            delay = self._delay(attempt, response)
+            print('Retrying {} in {:.1f}s ({})'.format(url, delay, error or response.status_code))
+            with self._lock:
+                self.backoff_seconds += delay
+            time.sleep(delay)
+            attempt += 1
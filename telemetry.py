@@ -0,0 +1,143 @@
+"""
+Telemetry of the crawl.
+
+The WebScrapper times every stage of its work (download, parse, browser, persist) and counts the pages and the
+bytes it handled. The timings are kept in latency histograms in memory and every measure can also be appended
+as one JSON object per line to a log file. The summary is available from ``Telemetry.snapshot`` or as JSON from a
+small HTTP endpoint started with ``Telemetry.serve``.
+"""
+import bisect
+import json
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# Upper bounds of the buckets of the histograms, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float('inf'))
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """http.server.ThreadingHTTPServer, which only exists from Python 3.7"""
+    daemon_threads = True
+
+
+class Histogram(object):
+    """A latency histogram with fixed buckets."""
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """The upper bound of the bucket that holds the quantile ``q``."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(bound, self.max)
+        return 0.0
+
+    def snapshot(self):
+        return {'count': self.count, 'total': round(self.total, 6),
+                'mean': round(self.total / self.count, 6) if self.count else 0.0,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'max': round(self.max, 6),
+                'buckets': {str(bound): count for bound, count in zip(BUCKETS, self.counts) if count}}
+
+
+class Telemetry(object):
+    """
+    Collects the timings and the counters of a crawl.
+
+    Parameters
+    ----------
+    log_path : str, default None
+        If given, every measure is appended to this file as a JSON line.
+    """
+    def __init__(self, log_path=None):
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._log = open(log_path, 'a') if log_path else None
+        self._server = None
+
+    def _emit(self, event):
+        if self._log is not None:
+            line = json.dumps(event) + '\n'
+            with self._lock:
+                self._log.write(line)
+                self._log.flush()
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """Times the ``with`` block as a stage of the crawl. The fields are added to the log line."""
+        begin = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            seconds = time.perf_counter() - begin
+            with self._lock:
+                self.histograms.setdefault(name, Histogram()).observe(seconds)
+            event = dict(fields, ts=time.time(), stage=name, seconds=round(seconds, 6))
+            if error:
+                event['error'] = error
+            self._emit(event)
+
+    def count(self, name, value=1):
+        """Adds ``value`` to a counter, e.g. the pages or the bytes downloaded."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        """The histograms of the stages, the counters and the throughput since the start of the crawl."""
+        elapsed = max(time.time() - self.started, 1e-9)
+        with self._lock:
+            counters = dict(self.counters)
+            stages = {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+        return {'elapsed': round(elapsed, 3), 'stages': stages, 'counters': counters,
+                'pages_per_second': counters.get('pages', 0) / elapsed,
+                'bytes_per_second': counters.get('bytes', 0) / elapsed}
+
+    def serve(self, port=9100, host='127.0.0.1'):
+        """Serves the snapshot as JSON on http://host:port/ from a background thread."""
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(telemetry.snapshot()).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address
+
+    def close(self):
+        """Stops the metrics endpoint and closes the log file."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._log is not None:
+            self._log.close()
+            self._log = None
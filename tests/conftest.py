@@ -0,0 +1,92 @@
+"""Fixtures shared by the tests: the modules of the repository and a local HTTP server standing in for the inspectorate."""
+import os
+import re
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _Server(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves the pages of the tests:
+
+    * ``/results/<n>``: a result page linking to the school pages ``/school/<n>-<k>``, served slowly
+    * ``/school/<name>``: a school page
+    * ``/page/<name>``: a page with an ETag, answering 304 to a matching If-None-Match
+    * ``/flaky/<name>``: answers 503 with Retry-After 0 to the first ``fail`` requests of the name, then 200
+    * ``/site/<path>``: the HTML of ``site[path]``, 404 if the test did not define it
+    """
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b'', headers=()):
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.server.state
+        with state['lock']:
+            state['requests'].append((self.path, dict(self.headers)))
+            state['in_flight'] += 1
+            state['peak'] = max(state['peak'], state['in_flight'])
+        try:
+            self._route(state)
+        finally:
+            with state['lock']:
+                state['in_flight'] -= 1
+
+    def _route(self, state):
+        match = re.match(r'/(\w+)/(.+)$', self.path)
+        kind, name = match.groups() if match else (None, None)
+        if kind == 'results':
+            time.sleep(state['delay'])
+            links = ''.join('<a href="/school/{0}-{1}">School {0}-{1}</a>'.format(name, k) for k in range(3))
+            self._send(200, '<html><body>{}</body></html>'.format(links).encode())
+        elif kind == 'school':
+            time.sleep(state['delay'])
+            self._send(200, 'School page {}'.format(name).encode())
+        elif kind == 'page':
+            etag = '"{}"'.format(state['versions'].get(name, 1))
+            if self.headers.get('If-None-Match') == etag:
+                self._send(304, headers=[('ETag', etag)])
+            else:
+                self._send(200, (name * 100).encode()[:state['size']], headers=[('ETag', etag)])
+        elif kind == 'flaky':
+            with state['lock']:
+                failures = state['failures'][name] = state['failures'].get(name, 0) + 1
+            if failures <= state['fail']:
+                self._send(503, b'busy', headers=[('Retry-After', '0')])
+            else:
+                self._send(200, b'ok')
+        elif kind == 'site' and name in state['site']:
+            self._send(200, state['site'][name].encode('utf-8'))
+        else:
+            self._send(404)
+
+
+@pytest.fixture
+def http_server():
+    """A local HTTP server, its ``state`` dict records the requests and configures the pages."""
+    server = _Server(('127.0.0.1', 0), StandInHandler)
+    server.state = {'lock': threading.Lock(), 'requests': [], 'in_flight': 0, 'peak': 0, 'delay': 0.05,
+                    'versions': {}, 'size': 100, 'failures': {}, 'fail': 2, 'site': {}}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    yield server
+    server.shutdown()
+    server.server_close()
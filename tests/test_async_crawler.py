@@ -0,0 +1,104 @@
+import re
+import time
+
+import requests
+
+from async_crawler import AsyncCrawler
+from utils import TokenBucket
+
+LINK = re.compile(r'<a href="([^"]+)">([^<]+)</a>')
+
+
+class LocalScrapper(object):
+    """The parts of the WebScrapper that the engine uses, requesting the pages of the local server."""
+    def __init__(self, base_url, rate=1000, burst=100):
+        self.base_url = base_url
+        self.rate_limiter = TokenBucket(rate, burst)
+        self.session = requests.Session()
+
+    def _request_page(self, link):
+        response = self.session.get(link)
+        response.raise_for_status()
+        return response.content
+
+    def parse_links(self, html, regex=None):
+        return {name: self.base_url + href for href, name in LINK.findall(html.decode())}
+
+    def _access_page(self, link):
+        return {link: self._request_page(link).decode()}
+
+
+def result_pages(server, count):
+    return ['{}/results/{}'.format(server.url, number) for number in range(count)]
+
+
+def test_web_crawler_merges_the_links_of_all_the_pages(http_server):
+    crawler = AsyncCrawler(LocalScrapper(http_server.url), max_per_host=4)
+    try:
+        links = crawler.web_crawler(result_pages(http_server, 5))
+    finally:
+        crawler.close()
+    assert len(links) == 15
+    assert links['School 3-2'] == http_server.url + '/school/3-2'
+
+
+def test_requests_in_flight_are_bounded_per_host(http_server):
+    crawler = AsyncCrawler(LocalScrapper(http_server.url), max_per_host=3)
+    try:
+        crawler.web_crawler(result_pages(http_server, 12))
+    finally:
+        crawler.close()
+    assert 1 < http_server.state['peak'] <= 3
+
+
+def test_requests_share_the_rate_limiter_of_the_scrapper(http_server):
+    http_server.state['delay'] = 0
+    crawler = AsyncCrawler(LocalScrapper(http_server.url, rate=20, burst=1), max_per_host=4)
+    start = time.monotonic()
+    try:
+        crawler.web_crawler(result_pages(http_server, 6))
+    finally:
+        crawler.close()
+    # The first request uses the token of the bucket, the 5 other ones wait 1/20s each
+    assert time.monotonic() - start >= 0.2
+
+
+def test_web_access_returns_the_content_of_every_page(http_server):
+    crawler = AsyncCrawler(LocalScrapper(http_server.url), max_per_host=4, access_workers=3)
+    links = ['{}/school/{}'.format(http_server.url, number) for number in range(9)]
+    try:
+        first = crawler.web_access(links)
+        # The engine can be used again after a crawl
+        second = crawler.web_access(links[:2])
+    finally:
+        crawler.close()
+    assert first == {link: 'School page {}'.format(number) for number, link in enumerate(links)}
+    assert len(second) == 2
+    assert 1 < http_server.state['peak'] <= 3
+
+
+def test_a_failing_page_does_not_lose_the_links_of_the_other_ones(http_server):
+    crawler = AsyncCrawler(LocalScrapper(http_server.url), max_per_host=4)
+    missing = http_server.url + '/missing/page'
+    try:
+        links = crawler.web_crawler(result_pages(http_server, 3) + [missing])
+    finally:
+        crawler.close()
+    assert len(links) == 9
+    assert list(crawler.failed) == [missing]
+    assert isinstance(crawler.failed[missing], requests.HTTPError)
+    assert crawler.failed[missing].response.status_code == 404
+
+
+def test_the_failed_pages_of_web_access_are_recorded(http_server):
+    crawler = AsyncCrawler(LocalScrapper(http_server.url), access_workers=2)
+    links = ['{}/school/{}'.format(http_server.url, number) for number in range(3)]
+    try:
+        first = crawler.web_access(links + [http_server.url + '/missing/page'])
+        second = crawler.web_access(links)
+    finally:
+        crawler.close()
+    assert first == second
+    assert len(first) == 3
+    # Every call starts with no failed pages
+    assert crawler.failed == {}
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from browser_pool import BrowserPool
+
+
+class FakeBrowser(object):
+    """The parts of a splinter browser that the pool uses."""
+    def __init__(self):
+        self.closed = False
+        self.crashed = False
+
+    @property
+    def url(self):
+        if self.crashed:
+            raise ConnectionError('The browser does not respond')
+        return 'about:blank'
+
+    def quit(self):
+        self.closed = True
+
+
+@pytest.fixture
+def browsers():
+    return []
+
+
+@pytest.fixture
+def factory(browsers):
+    def create_browser():
+        browsers.append(FakeBrowser())
+        return browsers[-1]
+    return create_browser
+
+
+def test_browsers_are_started_lazily_and_reused(factory, browsers):
+    pool = BrowserPool(factory, size=2)
+    assert browsers == []
+    for _ in range(3):
+        with pool.browser():
+            pass
+    assert len(browsers) == 1
+    pool.close()
+    assert browsers[0].closed
+
+
+def test_idle_browsers_are_closed_without_new_checkouts(factory, browsers):
+    pool = BrowserPool(factory, max_idle=0.1)
+    with pool.browser():
+        pass
+    time.sleep(0.3)
+    assert browsers[0].closed
+    # The slot of the closed browser is free again
+    with pool.browser() as browser:
+        assert browser is browsers[1]
+    pool.close()
+
+
+def test_busy_browsers_are_not_closed_by_the_reaper(factory, browsers):
+    pool = BrowserPool(factory, max_idle=0.1)
+    with pool.browser():
+        pass
+    with pool.browser() as browser:
+        time.sleep(0.3)
+        assert not browser.closed
+    assert not browser.closed
+    pool.close()
+
+
+def test_browsers_are_restarted_after_max_uses_and_crashes(factory, browsers):
+    pool = BrowserPool(factory, max_uses=2)
+    for _ in range(2):
+        with pool.browser():
+            pass
+    assert browsers[0].closed
+    with pytest.raises(ValueError):
+        with pool.browser() as browser:
+            browser.crashed = True
+            raise ValueError('The page broke the browser')
+    assert browsers[1].closed and pool.restarted == 1
+    pool.close()
+
+
+def test_the_pool_bounds_the_browsers_running_at_once(factory, browsers):
+    pool = BrowserPool(factory, size=2)
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def work():
+        with pool.browser():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2 and len(browsers) == 2
+    pool.close()
@@ -0,0 +1,52 @@
+from frontier import DONE, FAILED, IN_FLIGHT, PENDING, CrawlFrontier
+
+
+def test_urls_are_claimed_once_in_order(tmpdir):
+    frontier = CrawlFrontier(str(tmpdir.join('frontier.db')))
+    assert frontier.add(['a', 'b', 'c']) == 3
+    assert frontier.add(['a', 'd']) == 1
+    assert frontier.claim(limit=2) == ['a', 'b']
+    assert frontier.claim(limit=5) == ['c', 'd']
+    assert frontier.claim() == []
+    assert frontier.counts('school')[IN_FLIGHT] == 4
+
+
+def test_a_new_frontier_resumes_the_crawl_where_it_stopped(tmpdir):
+    path = str(tmpdir.join('frontier.db'))
+    frontier = CrawlFrontier(path)
+    frontier.add(['a', 'b', 'c'])
+    frontier.add(['results'], kind='results')
+    frontier.claim(limit=2)
+    frontier.done('a')
+    # The crawl stops with b in flight
+    frontier.close()
+
+    frontier = CrawlFrontier(path)
+    frontier.resume()
+    assert frontier.state('a') == DONE
+    assert frontier.state('b') == PENDING
+    assert frontier.claim(limit=5) == ['b', 'c']
+    assert frontier.counts('results') == {PENDING: 1, IN_FLIGHT: 0, DONE: 0, FAILED: 0}
+
+
+def test_urls_fail_once_they_used_all_their_attempts(tmpdir):
+    frontier = CrawlFrontier(str(tmpdir.join('frontier.db')), max_attempts=2)
+    frontier.add(['a'])
+    for state in (PENDING, FAILED):
+        frontier.claim()
+        frontier.failed('a', ValueError('broken'))
+        assert frontier.state('a') == state
+    assert frontier.claim() == []
+    frontier.retry_failed()
+    assert frontier.claim() == ['a']
+
+
+def test_released_urls_keep_their_attempts(tmpdir):
+    frontier = CrawlFrontier(str(tmpdir.join('frontier.db')), max_attempts=1)
+    frontier.add(['a'])
+    for _ in range(3):
+        assert frontier.claim() == ['a']
+        frontier.release('a')
+    frontier.claim()
+    frontier.failed('a')
+    assert frontier.state('a') == FAILED
@@ -0,0 +1,73 @@
+import os
+
+import requests
+
+from http_cache import HTTPCache
+
+
+def getter(session):
+    return lambda url, **kwargs: session.get(url, **kwargs)
+
+
+def page_requests(server):
+    return [headers for path, headers in server.state['requests'] if path.startswith('/page/')]
+
+
+def test_fresh_entries_are_served_without_a_request(http_server, tmpdir):
+    cache = HTTPCache(str(tmpdir))
+    get = getter(requests.Session())
+    url = http_server.url + '/page/a'
+    assert cache.fetch(url, get) == b'a' * 100
+    assert cache.fetch(url, get) == b'a' * 100
+    assert len(page_requests(http_server)) == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_stale_entries_are_revalidated_and_a_304_reuses_the_body(http_server, tmpdir):
+    cache = HTTPCache(str(tmpdir), ttl=0)
+    get = getter(requests.Session())
+    url = http_server.url + '/page/a'
+    cache.fetch(url, get)
+    assert cache.fetch(url, get) == b'a' * 100
+    revalidation = page_requests(http_server)[1]
+    assert revalidation['If-None-Match'] == '"1"'
+    assert cache.stats()['revalidated'] == 1
+
+
+def test_a_changed_page_replaces_the_entry(http_server, tmpdir):
+    cache = HTTPCache(str(tmpdir), ttl=0)
+    get = getter(requests.Session())
+    url = http_server.url + '/page/a'
+    cache.fetch(url, get)
+    http_server.state['versions']['a'] = 2
+    http_server.state['size'] = 50
+    assert cache.fetch(url, get) == b'a' * 50
+    assert cache.stats()['misses'] == 2
+    assert cache.stats()['bytes'] == 50
+
+
+def test_the_least_recently_used_entries_are_evicted(http_server, tmpdir):
+    cache = HTTPCache(str(tmpdir), max_bytes=250)
+    get = getter(requests.Session())
+    urls = [http_server.url + '/page/' + name for name in 'abc']
+    cache.fetch(urls[0], get)
+    cache.fetch(urls[1], get)
+    # Reading the first entry makes the second one the least recently used
+    cache.fetch(urls[0], get)
+    cache.fetch(urls[2], get)
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['bytes'] <= 250
+    assert not os.path.exists(os.path.join(str(tmpdir), HTTPCache.key(urls[1]) + '.body'))
+    cache.fetch(urls[0], get)
+    assert cache.stats()['hits'] == 2
+
+
+def test_the_entries_are_reused_by_a_new_cache(http_server, tmpdir):
+    get = getter(requests.Session())
+    url = http_server.url + '/page/a'
+    HTTPCache(str(tmpdir)).fetch(url, get)
+    cache = HTTPCache(str(tmpdir))
+    assert cache.fetch(url, get) == b'a' * 100
+    assert cache.stats()['hits'] == 1
+    assert len(page_requests(http_server)) == 1
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+import page_parser
+from incremental import FingerprintStore
+from utils import ConfigDict
+from web_scrapper import DELTA_OUTPUT, RESULTS_OUTPUT, WebScrapper
+
+PROGRAMS = {'25000': ('Niveau 2', 'Voldoende'), '25013': ('Niveau 4', 'Onvoldoende')}
+
+
+def school_page(name):
+    return ('<html><body><h1 class="heading">{0}</h1><div id="tabs"><ul><li><a href="#algemeen">Algemeen</a></li>'
+            '<li><a href="/site/{0}-tab">Opleidingen</a></li></ul></div></body></html>').format(name)
+
+
+def programs_tab(programs):
+    return '<div>{}</div>'.format(''.join(
+        '<h3 class="remote-accordion">{} {} Kok</h3><div class="l-1of4">{}</div>'.format(code, details, label)
+        for code, (details, label) in sorted(programs.items())))
+
+
+def expected(name, programs):
+    return {code: {'institute': name, 'label': label, 'Details': details.split()}
+            for code, (details, label) in programs.items()}
+
+
+@pytest.fixture
+def scrapper(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    scrapper = WebScrapper('', rate=1000, burst=100, incremental=True)
+    yield scrapper
+    scrapper.close()
+
+
+def deltas():
+    with open(DELTA_OUTPUT) as fh:
+        return [json.loads(line) for line in fh]
+
+
+def test_unchanged_pages_are_skipped_and_changes_are_recorded(http_server, scrapper):
+    site = http_server.state['site']
+    site['nova'], site['nova-tab'] = school_page('nova'), programs_tab(PROGRAMS)
+    url = http_server.url + '/site/nova'
+    assert scrapper.web_access(url) == expected('nova', PROGRAMS)
+    assert scrapper.web_access(url) == expected('nova', PROGRAMS)
+    assert scrapper.telemetry.counters['unchanged'] == 1
+    assert len(deltas()) == 1
+
+    site['nova-tab'] = programs_tab({'25000': ('Niveau 2', 'Onvoldoende'), '25026': ('Niveau 3', 'Voldoende')})
+    scrapper.web_access(url)
+    delta = deltas()[-1]
+    assert list(delta['changed']) == ['25000']
+    assert list(delta['added']) == ['25026']
+    assert delta['removed'] == ['25013']
+    assert scrapper.telemetry.counters['unchanged'] == 1
+
+
+def test_removed_programs_are_removed_from_the_results(http_server, scrapper):
+    site = http_server.state['site']
+    site['nova'], site['nova-tab'] = school_page('nova'), programs_tab(PROGRAMS)
+    site['alfa'], site['alfa-tab'] = school_page('alfa'), programs_tab({'25000': ('Niveau 3', 'Voldoende')})
+    scrapper.web_access(http_server.url + '/site/nova')
+    scrapper.web_access(http_server.url + '/site/alfa')
+    # 25000 is now the program of alfa in the results, the codes are shared by the schools
+    site['nova-tab'] = programs_tab({'25026': ('Niveau 3', 'Voldoende')})
+    scrapper.web_access(http_server.url + '/site/nova')
+    scrapper.openfile.close()
+    results = ConfigDict(RESULTS_OUTPUT)
+    assert sorted(results) == ['25000', '25026']
+    assert "'institute': 'alfa'" in results['25000']
+
+
+def test_pages_extracted_by_the_browser_are_extracted_again(http_server, scrapper):
+    site = http_server.state['site']
+    # The tab is served without its programs, only the browser finds them
+    site['nova'], site['nova-tab'] = school_page('nova'), programs_tab({})
+    found = {'programs': expected('nova', PROGRAMS)}
+    scrapper.extract_browser = lambda link, company=None: found['programs']
+    url = http_server.url + '/site/nova'
+    assert scrapper.web_access(url) == expected('nova', PROGRAMS)
+    found['programs'] = expected('nova', {'25000': ('Niveau 2', 'Onvoldoende')})
+    assert scrapper.web_access(url) == found['programs']
+    assert 'unchanged' not in scrapper.telemetry.counters
+    assert deltas()[-1]['removed'] == ['25013']
+
+
+def test_the_fingerprint_of_a_tab_without_programs_is_none():
+    assert page_parser.fingerprint('nova', None) is None
+    assert page_parser.fingerprint('nova', page_parser.parse_html(programs_tab({}))) is None
+    tab = page_parser.parse_html(programs_tab(PROGRAMS))
+    assert page_parser.fingerprint('nova', tab) == page_parser.fingerprint('nova', tab)
+    assert page_parser.fingerprint('nova', tab) != page_parser.fingerprint('other', tab)
+
+
+def test_the_store_returns_the_programs_of_an_unchanged_page(tmpdir):
+    store = FingerprintStore(str(tmpdir.join('fingerprints.db')))
+    programs = expected('nova', PROGRAMS)
+    assert store.unchanged('page', 'abc') is None
+    store.record('page', 'abc', programs)
+    assert store.unchanged('page', 'abc') == programs
+    assert store.unchanged('page', 'abd') is None
+    assert store.unchanged('page', None) is None
+    store.close()
+
+
+def test_the_delta_compares_the_programs_with_the_last_crawl(tmpdir):
+    store = FingerprintStore(str(tmpdir.join('fingerprints.db')))
+    programs = expected('nova', PROGRAMS)
+    assert store.delta('page', programs) == {'url': 'page', 'added': programs, 'changed': {}, 'removed': []}
+    store.record('page', 'abc', programs)
+    # Tuples and lists of details are equal
+    same = {code: dict(program, Details=tuple(program['Details'])) for code, program in programs.items()}
+    assert store.delta('page', same) == {'url': 'page', 'added': {}, 'changed': {}, 'removed': []}
+    assert store.delta('page', {})['removed'] == ['25000', '25013']
+    store.close()
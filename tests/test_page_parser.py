@@ -0,0 +1,34 @@
+import os
+
+import page_parser
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as fh:
+        return fh.read()
+
+
+def test_links_and_pager_of_a_results_page():
+    html = fixture('results_page.html')
+    links = page_parser.parse_links(html, '/zoek-en-vergelijk/school/')
+    assert len(links) == 25
+    assert all(url.startswith('https://www.zoekscholen.onderwijsinspectie.nl/zoek-en-vergelijk/school/')
+               for url in links.values())
+    assert page_parser.parse_next_page_number(html) == 2
+    assert page_parser.parse_result_count(html) == (1236, 25)
+
+
+def test_programs_of_a_school_page():
+    page = page_parser.parse_html(fixture('school_page.html'))
+    company = page_parser.COMPANY(page)
+    assert company == 'Nova College Haarlem'
+    assert page_parser.TAB_LINK(page) == ['/zoek-en-vergelijk/school/20037/nova-college-haarlem/opleidingen']
+    tab = page_parser.parse_html(fixture('programs_tab.html'))
+    programs = page_parser.parse_programs(tab, company)
+    assert len(programs) == 30
+    assert programs['25000']['institute'] == company
+    assert programs['25000']['Details'][0] == 'Niveau'
+    assert {program['label'] for program in programs.values()} <= {'Voldoende', 'Onvoldoende'}
+    assert page_parser.fingerprint(company, tab) == page_parser.fingerprint(company, tab)
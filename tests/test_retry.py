@@ -0,0 +1,108 @@
+import time
+
+import pytest
+import requests
+
+import retry
+from retry import CircuitOpenError, RetryPolicy
+
+
+class RecordingTime(object):
+    """The time module of retry, recording the backoff delays instead of sleeping."""
+    def __init__(self):
+        self.delays = []
+        self.monotonic = time.monotonic
+        self.time = time.time
+
+    def sleep(self, delay):
+        self.delays.append(delay)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    clock = RecordingTime()
+    monkeypatch.setattr(retry, 'time', clock)
+    return clock.delays
+
+
+class Response(object):
+    status_code = 200
+
+
+def failing_send(calls):
+    def send():
+        calls.append(time.monotonic())
+        raise requests.ConnectionError('refused')
+    return send
+
+
+def test_transient_statuses_are_retried_until_they_succeed(http_server, sleeps):
+    policy = RetryPolicy(max_retries=3)
+    session = requests.Session()
+    url = http_server.url + '/flaky/a'
+    response = policy.call(url, lambda: session.get(url))
+    assert response.status_code == 200
+    assert policy.stats()['retries'] == 2
+    # Retry-After: 0 is honoured instead of the exponential backoff
+    assert sleeps == [0.0, 0.0]
+
+
+def test_the_backoff_grows_exponentially_and_is_capped(sleeps):
+    policy = RetryPolicy(max_retries=6, backoff=0.5, max_backoff=4, failure_threshold=100, min_budget=100)
+    with pytest.raises(requests.ConnectionError):
+        policy.call('http://host/page', failing_send([]))
+    assert len(sleeps) == 6
+    for attempt, delay in enumerate(sleeps):
+        assert 0 <= delay <= min(4, 0.5 * 2 ** attempt)
+
+
+def test_the_last_response_is_returned_when_the_retries_are_exhausted(http_server, sleeps):
+    http_server.state['fail'] = 10
+    policy = RetryPolicy(max_retries=2)
+    session = requests.Session()
+    url = http_server.url + '/flaky/b'
+    assert policy.call(url, lambda: session.get(url)).status_code == 503
+    assert len(sleeps) == 2
+
+
+def test_the_retry_budget_caps_the_retries(sleeps):
+    policy = RetryPolicy(max_retries=5, budget=0, min_budget=3, failure_threshold=100)
+    for _ in range(3):
+        with pytest.raises(requests.ConnectionError):
+            policy.call('http://host/page', failing_send([]))
+    assert policy.stats()['retries'] == 3
+    assert policy.stats()['budget_exhausted'] == 3
+
+
+def test_an_open_circuit_rejects_requests_until_it_cools_down(sleeps):
+    policy = RetryPolicy(max_retries=0, failure_threshold=2, reset_timeout=0.2)
+    calls = []
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            policy.call('http://host/page', failing_send(calls))
+    with pytest.raises(CircuitOpenError) as error:
+        policy.call('http://host/other', failing_send(calls))
+    assert len(calls) == 2
+    assert 0 < error.value.retry_after <= 0.2
+    assert policy.stats()['open_circuits'] == ['host']
+    # Other hosts are not affected
+    assert policy.call('http://other/page', Response).status_code == 200
+
+    time.sleep(0.25)
+    assert policy.open_for('http://host/page') == 0
+    # Half open: one request goes through and its success closes the circuit
+    assert policy.call('http://host/page', Response).status_code == 200
+    assert policy.stats()['open_circuits'] == []
+
+
+def test_a_failure_while_half_open_opens_the_circuit_again(sleeps):
+    policy = RetryPolicy(max_retries=0, failure_threshold=1, reset_timeout=0.1)
+    calls = []
+    with pytest.raises(requests.ConnectionError):
+        policy.call('http://host/page', failing_send(calls))
+    time.sleep(0.15)
+    with pytest.raises(requests.ConnectionError):
+        policy.call('http://host/page', failing_send(calls))
+    with pytest.raises(CircuitOpenError):
+        policy.call('http://host/page', failing_send(calls))
+    assert len(calls) == 2
@@ -0,0 +1,190 @@
+import os
+
+import utils
+from utils import HEADER_PREFIX, ConfigDict, MappedConfig
+
+
+def lines(path):
+    with open(path) as fh:
+        return fh.read().splitlines()
+
+
+def test_a_reopened_file_has_the_latest_values(tmpdir):
+    path = str(tmpdir.join('config_file.txt'))
+    store = ConfigDict(path)
+    store['a'] = '1'
+    store['b'] = "{'label': 'x'}"
+    store['a'] = '2'
+    store.close()
+    assert ConfigDict(path) == {'a': '2', 'b': "{'label': 'x'}"}
+
+
+def test_batches_are_written_together(tmpdir):
+    path = str(tmpdir.join('config_file.txt'))
+    store = ConfigDict(path)
+    with store:
+        store['a'] = '1'
+        store.update(b='2', c='3')
+        assert len(lines(path)) == 1
+    assert len(lines(path)) == 4
+    store.close()
+
+
+def test_the_log_is_compacted_once_it_holds_too_many_stale_lines(tmpdir):
+    path = str(tmpdir.join('config_file.txt'))
+    store = ConfigDict(path, compact_ratio=2.0, min_compact_lines=10)
+    for round_number in range(5):
+        for key in 'abc':
+            store[key] = '{}{}'.format(key, round_number)
+    store.close()
+    written = lines(path)
+    # The header and at most compact_ratio lines per key, or min_compact_lines
+    assert written[0].startswith(HEADER_PREFIX)
+    assert len(written) - 1 <= 10
+    assert ConfigDict(path) == {'a': 'a4', 'b': 'b4', 'c': 'c4'}
+
+
+def test_compaction_renews_the_header(tmpdir):
+    path = str(tmpdir.join('config_file.txt'))
+    store = ConfigDict(path)
+    store['a'] = '1'
+    header = lines(path)[0]
+    store.compact()
+    store.close()
+    assert lines(path)[0] != header
+    assert ConfigDict(path) == {'a': '1'}
+
+
+def test_an_incomplete_last_line_is_dropped(tmpdir):
+    path = str(tmpdir.join('config_file.txt'))
+    store = ConfigDict(path)
+    store['a'] = '1'
+    store.close()
+    with open(path, 'a') as fh:
+        fh.write('b,half a val')
+    store = ConfigDict(path)
+    assert store == {'a': '1'}
+    store['c'] = '3'
+    store.close()
+    assert ConfigDict(path) == {'a': '1', 'c': '3'}
+
+
+def test_an_incomplete_line_longer_than_a_block_is_dropped(tmpdir, monkeypatch):
+    monkeypatch.setattr(utils, '_TAIL_BLOCK', 8)
+    path = str(tmpdir.join('config_file.txt'))
+    store = ConfigDict(path)
+    store.update(a='1', b='x' * 30)
+    store.close()
+    with open(path, 'a') as fh:
+        fh.write('c,' + 'y' * 50)
+    store = ConfigDict(path)
+    store['d'] = '4'
+    store.close()
+    assert ConfigDict(path) == {'a': '1', 'b': 'x' * 30, 'd': '4'}
+
+
+def test_line_breaks_and_commas_are_escaped(tmpdir):
+    path = str(tmpdir.join('config_file.txt'))
+    store = ConfigDict(path)
+    store['code,1'] = 'first line\nsecond line \\ end'
+    store.close()
+    assert len(lines(path)) == 2
+    assert ConfigDict(path) == {'code,1': 'first line\nsecond line \\ end'}
+    with MappedConfig(path) as mapped:
+        assert mapped['code,1'] == 'first line\nsecond line \\ end'
+
+
+def test_files_of_older_versions_are_converted(tmpdir):
+    path = str(tmpdir.join('config_file.txt'))
+    with open(path, 'w') as fh:
+        fh.write("a,{'label': 'x'}\nb,2\n")
+    store = ConfigDict(path)
+    store.close()
+    assert store == {'a': "{'label': 'x'}", 'b': '2'}
+    assert lines(path)[0].startswith(HEADER_PREFIX)
+    assert ConfigDict(path) == store
+
+
+def test_deletions_are_persisted(tmpdir):
+    path = str(tmpdir.join('config_file.txt'))
+    store = ConfigDict(path)
+    store.update(a='1', b='2', c='3', d='4')
+    del store['a']
+    assert store.pop('b') == '2'
+    assert store.pop('missing', None) is None
+    assert store.popitem() == ('d', '4')
+    assert store.setdefault('e', '5') == '5'
+    assert store.setdefault('c', 'x') == '3'
+    store.close()
+    assert ConfigDict(path) == {'c': '3', 'e': '5'}
+    with MappedConfig(path, persist_index=False) as mapped:
+        assert dict(mapped) == {'c': '3', 'e': '5'}
+
+
+def test_a_deleted_key_can_be_written_again(tmpdir):
+    path = str(tmpdir.join('config_file.txt'))
+    store = ConfigDict(path)
+    store['a,\\d'] = '1'
+    with store:
+        del store['a,\\d']
+        store['a,\\d'] = '2'
+    store.close()
+    assert ConfigDict(path) == {'a,\\d': '2'}
+
+
+def test_compaction_drops_the_deleted_keys(tmpdir):
+    path = str(tmpdir.join('config_file.txt'))
+    store = ConfigDict(path)
+    store.update(a='1', b='2')
+    del store['a']
+    store.compact()
+    store.close()
+    assert lines(path)[1:] == ['b,2']
+    store = ConfigDict(path)
+    store.clear()
+    store.close()
+    assert len(lines(path)) == 1
+    assert ConfigDict(path) == {}
+
+
+def test_mapped_config_removes_the_keys_deleted_after_its_index(tmpdir):
+    path = str(tmpdir.join('config_file.txt'))
+    store = ConfigDict(path)
+    store.update(a='1', b='2')
+    with MappedConfig(path) as mapped:
+        assert 'a' in mapped
+    del store['a']
+    store.close()
+    with MappedConfig(path) as mapped:
+        assert dict(mapped) == {'b': '2'}
+
+
+def test_mapped_config_reuses_its_index_and_reads_appended_lines(tmpdir):
+    path = str(tmpdir.join('config_file.txt'))
+    store = ConfigDict(path)
+    store.update(('key{:03d}'.format(number), 'v{}'.format(number)) for number in range(50))
+    with MappedConfig(path) as mapped:
+        assert mapped['key010'] == 'v10'
+    assert os.path.exists(path + '.idx')
+    store['key050'] = 'v50'
+    store.close()
+    with MappedConfig(path) as mapped:
+        assert len(mapped) == 51
+        assert mapped['key050'] == 'v50'
+
+
+def test_mapped_config_rebuilds_the_index_of_a_rewritten_file(tmpdir):
+    path = str(tmpdir.join('config_file.txt'))
+    store = ConfigDict(path)
+    store.update(('key{:03d}'.format(number), 'v{}'.format(number)) for number in range(50))
+    store.close()
+    with MappedConfig(path) as mapped:
+        assert mapped['key010'] == 'v10'
+    # Rewritten in place, same inode and size, as after compactions that get the same inode back
+    with open(path) as fh:
+        content = fh.read()
+    header, rest = content.split('\n', 1)
+    with open(path, 'r+') as fh:
+        fh.write(HEADER_PREFIX + 'f' * (len(header) - len(HEADER_PREFIX)) + '\n' + rest.replace('v1', 'X1'))
+    with MappedConfig(path) as mapped:
+        assert mapped['key010'] == 'X10'
@@ -0,0 +1,51 @@
+import pytest
+
+from frontier import FAILED, CrawlFrontier
+from web_scrapper import DownloadError, WebScrapper
+
+SCHOOL_PAGE = ('<html><body><h1 class="heading">Nova</h1><div id="tabs"><ul><li><a href="#algemeen">Algemeen</a>'
+               '</li><li><a href="/site/{}">Opleidingen</a></li></ul></div></body></html>')
+BROWSER_PROGRAMS = {'25000': {'institute': 'Nova', 'label': 'Voldoende', 'Details': ['Niveau', '2']}}
+
+
+@pytest.fixture
+def scrapper():
+    scrapper = WebScrapper('', write=False, rate=1000, burst=100)
+    scrapper.browser_visits = []
+
+    def extract_browser(link, company=None):
+        scrapper.browser_visits.append(link)
+        return BROWSER_PROGRAMS
+    scrapper.extract_browser = extract_browser
+    yield scrapper
+    scrapper.close()
+
+
+def test_a_page_that_can_not_be_downloaded_is_not_sent_to_the_browser(http_server, scrapper):
+    with pytest.raises(DownloadError):
+        scrapper.web_access(http_server.url + '/site/missing')
+    http_server.state['site']['nova'] = SCHOOL_PAGE.format('missing-tab')
+    with pytest.raises(DownloadError):
+        scrapper.web_access(http_server.url + '/site/nova')
+    assert scrapper.browser_visits == []
+
+
+def test_a_page_without_programs_falls_back_to_the_browser(http_server, scrapper):
+    site = http_server.state['site']
+    site['nova'], site['nova-tab'] = SCHOOL_PAGE.format('nova-tab'), '<div>Geen opleidingen</div>'
+    url = http_server.url + '/site/nova'
+    assert scrapper.web_access(url) == BROWSER_PROGRAMS
+    assert scrapper.browser_visits == [url]
+
+
+def test_the_crawl_records_the_pages_that_can_not_be_downloaded(http_server, scrapper, tmpdir):
+    frontier = CrawlFrontier(str(tmpdir.join('frontier.db')), max_attempts=1)
+    url = http_server.url + '/site/missing'
+    # The result pages are already crawled
+    frontier.add([http_server.url + '/results/0'], kind='results')
+    frontier.done(frontier.claim('results')[0])
+    frontier.add([url])
+    scrapper.crawl(frontier)
+    assert frontier.state(url) == FAILED
+    assert scrapper.browser_visits == []
+    frontier.close()
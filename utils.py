@@ -1,26 +1,411 @@
 """Provides some utilities widely used by other modules"""
+import asyncio
+import mmap
 import os
+import pickle
+import re
+import hashlib
+import threading
+import time
+import uuid
+from collections.abc import Mapping
+
+# A complete ``key,value`` line of a ConfigDict file, or the tombstone of a deleted key
+_LINE = re.compile(rb'(?m)^(?:([^,\n]*),([^\n]*)|\\d([^,\n]*))\n')
+# Size of the blocks read backwards from the end of a ConfigDict file to find its last line break
+_TAIL_BLOCK = 64 * 1024
+# Size of the first block of a file, whose hash tells whether a saved MappedConfig index belongs to the file
+_SIGNED_BYTES = 4096
+# First line of the files written by ConfigDict. Its token changes whenever the file is rewritten. Files without
+# it are written by an older ConfigDict, whose keys and values are not escaped.
+HEADER_PREFIX = '#ConfigDict 2 '
+_UNESCAPES = {'\\': '\\', 'n': '\n', 'r': '\r', 'c': ','}
+# Starts the line that deletes a key. Escaped keys never start with it, their backslashes are doubled.
+TOMBSTONE = '\\d'
+_ESCAPED = re.compile(r'\\(.)')
+
+
+def escape(text, key=False):
+    """Escapes the backslashes and the line breaks of a key or value of a ConfigDict, and the commas of a key."""
+    text = str(text).replace('\\', '\\\\').replace('\n', '\\n').replace('\r', '\\r')
+    return text.replace(',', '\\c') if key else text
+
+
+def unescape(text):
+    """Reverses escape."""
+    return _ESCAPED.sub(lambda match: _UNESCAPES.get(match.group(1), match.group(1)), text)
+
+
+def _header():
+    return '{}{}\n'.format(HEADER_PREFIX, uuid.uuid4().hex)
 
 
 class ConfigDict(dict):
-    ''''
-    Modified dict class that handles some exceptions.
     '''
-    def __init__(self, filename):
+    Modified dict class that persists every item to a plain text file, one ``key,value`` per line.
+
+    The file is an append-only log: every assignment appends a single line, so the cost of a write does not
+    depend on the size of the file. When the same key is written again the newer line wins when the file is
+    read back. Stale lines are removed by a compaction that rewrites the file once the log has grown to
+    ``compact_ratio`` times the number of live keys.
+
+    Writes can be grouped with ``update()`` or by using the dict as a context manager. Inside a batch the
+    lines are kept in memory and written together with a single fsync when the outermost batch ends.
+
+    Deleting a key, with ``del``, ``pop`` or ``popitem``, appends a tombstone line that removes the key when the
+    file is read back and is dropped by the next compaction. ``clear`` rewrites the file.
+
+    Keys and values are escaped so that they never contain a line break, see ``escape``. The file starts with a
+    header line that is renewed by every compaction. A last line cut short by a crash is dropped when the file is
+    opened, and files written by older versions without the header are rewritten in the current format.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the log file. It is created when it does not exist, otherwise its entries are loaded.
+    compact_ratio : float, default 2.0
+        Compact the log once it holds more than ``compact_ratio`` lines per live key.
+    min_compact_lines : int, default 1000
+        Never compact logs shorter than this, the rewrite is not worth it for small files.
+    '''
+    def __init__(self, filename, compact_ratio=2.0, min_compact_lines=1000):
         self._filename = filename
-        if not os.path.isfile(self._filename):
-            try:
-                open(self._filename, 'w').close()
-            except IOError:
-                raise IOError('Problem with the path')
-            with open(self._filename) as fh:
-                for line in fh:
-                    line = line.rstrip()
-                    key, value = line.split(',', 1)
-                    dict.__setitem__(self, key, value)
+        self.compact_ratio = compact_ratio
+        self.min_compact_lines = min_compact_lines
+        self._log_lines = 0
+        self._pending = []
+        self._batch_depth = 0
+        try:
+            open(self._filename, 'a').close()
+        except IOError:
+            raise IOError('Problem with the path')
+        self._drop_partial_line()
+        with open(self._filename) as fh:
+            first = fh.readline()
+            legacy = bool(first) and not first.startswith(HEADER_PREFIX)
+            if legacy:
+                fh.seek(0)
+            for line in fh:
+                line = line.rstrip('\n')
+                if not line:
+                    continue
+                if not legacy and line.startswith(TOMBSTONE):
+                    dict.pop(self, unescape(line[len(TOMBSTONE):]), None)
+                    self._log_lines += 1
+                    continue
+                key, separator, value = line.partition(',')
+                if not separator:
+                    print('Skipping a malformed line of {}: {!r}'.format(self._filename, line))
+                    continue
+                if not legacy:
+                    key, value = unescape(key), unescape(value)
+                dict.__setitem__(self, key, value)
+                self._log_lines += 1
+        if legacy or not first:
+            # Writes the header, and converts the lines of an older version
+            self._fh = None
+            self.compact()
+        else:
+            self._fh = open(self._filename, 'a')
+
+    def _drop_partial_line(self):
+        """Truncates the file after its last complete line, the rest of a write interrupted by a crash."""
+        with open(self._filename, 'rb+') as fh:
+            size = end = fh.seek(0, os.SEEK_END)
+            # Scans the file backwards from its end, block by block, until the last line break
+            while end > 0:
+                start = max(end - _TAIL_BLOCK, 0)
+                fh.seek(start)
+                newline = fh.read(end - start).rfind(b'\n')
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end < size:
+                fh.seek(end)
+                print('Dropping the incomplete last line of {}: {!r}'.format(self._filename, fh.read(200)))
+                fh.truncate(end)
 
     def __setitem__(self, key, value):
         dict.__setitem__(self, key, value)
-        with open(self._filename, 'w') as fh:
+        self._pending.append('{0},{1}\n'.format(escape(key, key=True), escape(value)))
+        if not self._batch_depth:
+            self._write_pending(sync=False)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._log_deletion(key)
+
+    def pop(self, key, *default):
+        present = key in self
+        value = dict.pop(self, key, *default)
+        if present:
+            self._log_deletion(key)
+        return value
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        self._log_deletion(key)
+        return key, value
+
+    def _log_deletion(self, key):
+        self._pending.append('{0}{1}\n'.format(TOMBSTONE, escape(key, key=True)))
+        if not self._batch_depth:
+            self._write_pending(sync=False)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def clear(self):
+        """Removes all the keys and rewrites the file without them."""
+        dict.clear(self)
+        self._pending = []
+        self.compact()
+
+    def update(self, *args, **kwargs):
+        """Sets all the given items and writes them to the log as one batch."""
+        with self:
+            for key, value in dict(*args, **kwargs).items():
+                self[key] = value
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __enter__(self):
+        self._batch_depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self.commit()
+        return False
+
+    def commit(self):
+        """Writes any pending lines of the current batch and forces them to disk."""
+        self._write_pending(sync=True)
+
+    def _write_pending(self, sync):
+        if self._pending:
+            self._fh.write(''.join(self._pending))
+            self._log_lines += len(self._pending)
+            self._pending = []
+            self._fh.flush()
+            if sync:
+                os.fsync(self._fh.fileno())
+        if self._log_lines > max(self.min_compact_lines, self.compact_ratio * len(self)):
+            self.compact()
+
+    def compact(self):
+        """Rewrites the log keeping only the latest line of every key."""
+        tmp_filename = self._filename + '.compact'
+        with open(tmp_filename, 'w') as fh:
+            fh.write(_header())
             for key, val in self.items():
-                fh.write('{0},{1}\n'.format(key, val))
+                fh.write('{0},{1}\n'.format(escape(key, key=True), escape(val)))
+            fh.flush()
+            os.fsync(fh.fileno())
+        if self._fh is not None:
+            self._fh.close()
+        os.replace(tmp_filename, self._filename)
+        self._fh = open(self._filename, 'a')
+        self._log_lines = len(self)
+
+    def close(self):
+        """Commits the pending lines and closes the log file."""
+        if not self._fh.closed:
+            self.commit()
+            self._fh.close()
+
+
+class MappedConfig(Mapping):
+    """
+    Read-only view of a ConfigDict file that does not load the values.
+
+    The file is memory mapped and only an index of ``key -> offset of the value`` is kept in memory, so lookups
+    and ``in`` checks cost O(1) and a value is decoded only when it is asked for. The index is saved next to
+    the file (``<filename>.idx``) and reused on the next open. Since the file is an append-only log, only the
+    lines appended after the index was saved have to be scanned, which makes opening a large crawl result
+    almost instant. A compaction of the file is detected and triggers a full rebuild: a saved index is only
+    reused if the file has the same inode, the hash of its first block (which holds the header that ConfigDict
+    renews on every compaction) did not change and its indexed part still ends with a line break.
+
+    Parameters
+    ----------
+    filename : str
+        The path of a file written by ConfigDict.
+    persist_index : bool, default True
+        If True the index is saved next to the file after it has been updated.
+    """
+    def __init__(self, filename, persist_index=True):
+        self._filename = filename
+        self._index_filename = filename + '.idx'
+        self.persist_index = persist_index
+        self._index = {}
+        self._indexed_size = 0
+        self._identity = None
+        self._signature = None
+        self._fh = None
+        self._mm = None
+        self._escaped = False
+        self._load_index()
+        self.refresh()
+
+    def _file_identity(self):
+        stat = os.stat(self._filename)
+        return (stat.st_dev, stat.st_ino), stat.st_size
+
+    def _load_index(self):
+        try:
+            with open(self._index_filename, 'rb') as fh:
+                saved = pickle.load(fh)
+        except (IOError, EOFError, KeyError, pickle.UnpicklingError):
+            return
+        identity, size = self._file_identity()
+        # The content is checked by refresh, once the file is mapped
+        if saved.get('identity') == identity and saved.get('size', size + 1) <= size:
+            self._index = saved['index']
+            self._indexed_size = saved['size']
+            self._identity = identity
+            self._signature = saved.get('signature')
+
+    @staticmethod
+    def _sign(data, size):
+        return hashlib.sha1(data[:min(size, _SIGNED_BYTES)]).hexdigest()
+
+    def _matches_index(self):
+        """True if the indexed part of the mapped file is the one the index was built from."""
+        size = self._indexed_size
+        if not size:
+            return True
+        return (size <= len(self._mm) and self._mm[size - 1:size] == b'\n'
+                and self._sign(self._mm, size) == self._signature)
+
+    def _save_index(self):
+        tmp_filename = self._index_filename + '.tmp'
+        with open(tmp_filename, 'wb') as fh:
+            pickle.dump({'identity': self._identity, 'size': self._indexed_size, 'signature': self._signature,
+                         'index': self._index}, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, self._index_filename)
+
+    def refresh(self):
+        """Maps the current content of the file and indexes the lines appended since the last refresh."""
+        identity, size = self._file_identity()
+        if identity != self._identity or size < self._indexed_size:
+            # The file has been compacted or replaced
+            self._reset(identity)
+        if size == self._indexed_size and self._mm is not None:
+            # The mapped file is still open, so its inode can not have been reused by another file
+            return
+        self._close_map()
+        if size == 0:
+            self._reset(identity)
+            return
+        self._fh = open(self._filename, 'rb')
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if not self._matches_index():
+            # Another file with the same inode, e.g. the file was compacted twice
+            self._reset(identity)
+        prefix = HEADER_PREFIX.encode()
+        self._escaped = self._mm[:len(prefix)] == prefix
+        index = self._index
+        start = self._indexed_size
+        for match in _LINE.finditer(self._mm, start):
+            start = match.end()
+            if match.group(3) is not None:
+                index.pop(unescape(match.group(3).decode()), None)
+                continue
+            key = match.group(1).decode()
+            index[unescape(key) if self._escaped else key] = match.start(2)
+        grown = start != self._indexed_size
+        self._indexed_size = start
+        if grown:
+            self._signature = self._sign(self._mm, start)
+            if self.persist_index:
+                self._save_index()
+
+    def _reset(self, identity):
+        self._index = {}
+        self._indexed_size = 0
+        self._identity = identity
+        self._signature = None
+
+    def __getitem__(self, key):
+        offset = self._index[key]
+        value = self._mm[offset:self._mm.find(b'\n', offset)].decode()
+        return unescape(value) if self._escaped else value
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _close_map(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._fh.close()
+            self._mm = self._fh = None
+
+    def close(self):
+        """Releases the memory map of the file."""
+        self._close_map()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class TokenBucket(object):
+    """
+    Token bucket rate limiter shared by threads and coroutines.
+
+    Tokens are added at ``rate`` per second up to ``capacity``. Every request takes one token; when the bucket
+    is empty the caller waits until its token has been refilled. Waiting callers reserve their token in advance,
+    so concurrent callers are spaced out evenly instead of all waking up together.
+
+    Parameters
+    ----------
+    rate : float
+        The number of requests allowed per second.
+    capacity : int, default 1
+        The size of the bucket, i.e. the number of requests that may be sent in a burst.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token and returns the number of seconds the caller has to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def wait(self):
+        """Blocks until a token is available."""
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire(self):
+        """Waits without blocking the event loop until a token is available."""
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
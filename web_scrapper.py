@@ -1,12 +1,21 @@
+import ast
 import bs4 as bs
-from urllib.request import urlopen
-from urllib.error import HTTPError, URLError
-import re
+import json
+import threading
+import time
+from functools import partial
+from urllib.parse import urljoin
 from splinter import Browser
 import requests
-import time
-from requests import Request
-from utils import ConfigDict
+from requests.adapters import HTTPAdapter
+import page_parser
+from async_crawler import AsyncCrawler
+from browser_pool import BrowserPool
+from incremental import FingerprintStore
+from results_store import ResultsWriter
+from retry import CircuitOpenError, RetryPolicy
+from telemetry import Telemetry
+from utils import ConfigDict, TokenBucket
 
 HEADERS = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_9_5)AppleWebKit 537.36 (KHTML, like Gecko) Chrome",
            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
@@ -14,6 +23,24 @@ HEADERS = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_9_5)AppleWeb
            }
 
 RESULTS_OUTPUT = 'config_file.txt'
+RESULTS_DIRECTORY = 'results'
+FINGERPRINTS_DB = 'fingerprints.db'
+DELTA_OUTPUT = 'delta.jsonl'
+RESULTS_PAGE = 'https://www.zoekscholen.onderwijsinspectie.nl/zoek-en-vergelijk?searchtype=generic&zoekterm=&pagina={}&filterSectoren=BVE'  # noqa
+
+
+def _institute(program):
+    """The institute of a program of the results file, which holds a dict or, once read back, its repr."""
+    if isinstance(program, str):
+        try:
+            program = ast.literal_eval(program)
+        except (ValueError, SyntaxError):
+            return None
+    return program.get('institute') if isinstance(program, dict) else None
+
+
+class DownloadError(requests.RequestException):
+    """Raised when a page that has to be extracted could not be downloaded, see WebScrapper.download."""
 
 
 class WebScrapper(object):
@@ -22,50 +49,131 @@ class WebScrapper(object):
     to fit the needs of the project.
     """
 
-    def __init__(self, source_url, write=True):
+    def __init__(self, source_url, write=True, rate=0.4, burst=1, pool_size=10, cache=None, extraction='http',
+                 browsers=1, retry_policy=None, telemetry=None, results_format='text',
+                 incremental=False):
         """
         Args:
             source_url (str): The url of the page that we would like to crawl.
             write (boolean): If True the results of the
+            rate (float): The maximum number of pages requested per second, in order to mimic a human behavior.
+            burst (int): The number of pages that may be requested at once before the rate applies.
+            pool_size (int): The number of keep-alive connections kept open per host.
+            cache (HTTPCache): If given, download serves the pages from this cache and revalidates them.
+            extraction (str): 'http' extracts the programs of a school from the HTML and falls back to the browser
+                when nothing is found, 'browser' always uses the browser.
+            browsers (int): The maximum number of browsers that run at the same time. They are only started when
+                a page needs one.
+            retry_policy (RetryPolicy): How the failed requests are retried, by default a RetryPolicy().
+            telemetry (Telemetry): Collects the timings of the download, parse, browser and persist stages and
+                the pages and bytes handled, by default an in-memory Telemetry().
+            results_format (str): 'text' writes the results to config_file.txt, 'arrow' writes the programs of
+                every page as a typed Arrow partition in the results directory, see results_store.
+            incremental (boolean): If True the pages whose fingerprint did not change since the last crawl are
+                neither extracted nor persisted again, the changes of the other ones are appended to delta.jsonl
+                and the programs they no longer offer are removed from the results, see incremental.
         """
         self.source_url = source_url
-        self._browser = self.create_browser()
+        self.browser_pool = BrowserPool(self.create_browser, size=browsers)
         self.write = write
+        self.rate_limiter = TokenBucket(rate, burst)
+        self.session = self.create_session(pool_size)
+        self.cache = cache
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.telemetry = telemetry or Telemetry()
+        self.extraction = extraction
+        self.results_format = results_format
+        self.fingerprints = FingerprintStore(FINGERPRINTS_DB) if incremental else None
+        self._write_lock = threading.Lock()
+        # The result pages that crawl_all_pages could not crawl, with their error
+        self.failed_pages = {}
         if self.write:
-            self.openfile = ConfigDict(RESULTS_OUTPUT)
+            if results_format == 'arrow':
+                self.openfile = ResultsWriter(RESULTS_DIRECTORY)
+            else:
+                self.openfile = ConfigDict(RESULTS_OUTPUT)
 
-    def download(self, url, num_retries=2):
+    def download(self, url, num_retries=None):
         """
         This method downloads a web page.  When a URL is passed, this function will download the web page
         and return the HTML.
         Often, the errors encountered when downloading are temporary. For example, the web server is overloaded
         and returns a 503 Service Unavailable error.
         For these errors, we can retry the download as the server problem may now be resolved.
-        The download method only retires the 5xx errors.
+        The retries follow the retry policy of the scrapper, like all its other requests: connection errors,
+        429 and 5xx errors are retried with an exponential backoff.
+        When the scrapper has a cache, fresh pages are read from the disk and stale ones are revalidated with
+        a conditional request.
 
         Parameters
         -------------------------
         url: String. The URL that we would like to download
-        num_retries: Int, default 2. The number of retries
+        num_retries: Int, default None. The number of retries, if None the one of the retry policy
 
         Returns
         --------------------------
         The HTML of the URL
+
+        Raises
+        --------------------------
+        CircuitOpenError: If the circuit breaker of the host is open.
         """
         print('Downloading:', url)
+        get = partial(self._get, max_retries=num_retries)
+        # The HTML is kept in a local variable, the pages are downloaded by several threads at once. self.html is
+        # only set for backward compatibility and never read back.
+        html = None
         try:
-            self.html = urlopen(url).read()
-        except HTTPError as e:
+            if self.cache is not None:
+                html = self.cache.fetch(url, get)
+            else:
+                response = get(url)
+                response.raise_for_status()
+                html = response.content
+        except requests.HTTPError as e:
             print(e)
-        except URLError as e:
-            print('Download error:', e.reason)
-            self.html = None
-            if num_retries > 2:
-                print('I will give one more try')
-                if hasattr(e, 'code') and 500 <= e.code < 600:
-                    # Recursively retry 5xx HTTP errors
-                    return self.download(url, num_retries - 1)
-        return self.html
+        except CircuitOpenError:
+            # The host is failing, the caller has to wait instead of moving on to the next page
+            raise
+        except requests.RequestException as e:
+            print('Download error:', e)
+        self.html = html
+        return html
+
+    def _get(self, url, max_retries=None, **kwargs):
+        """Sends a GET request through the keep-alive session of the scrapper, following its retry policy."""
+        with self.telemetry.stage('download', url=url):
+            response = self.retry_policy.call(url, lambda: self.session.get(url, **kwargs), max_retries)
+            self.telemetry.count('bytes', len(response.content))
+        return response
+
+    def retry_stats(self):
+        """Returns the requests sent and the retries spent since the retry policy was last reset."""
+        return self.retry_policy.stats()
+
+    def cache_stats(self):
+        """Returns the hits and misses of the cache of the scrapper, or None if it has no cache."""
+        if self.cache is None:
+            return None
+        return self.cache.stats()
+
+    def connection_stats(self):
+        """
+        Counts the connections of the session, in order to verify that they are kept alive between pages.
+
+        Returns
+        --------------------------
+        A dict with the number of requests sent, the connections opened (one TCP/TLS handshake each) and the
+        requests that reused an open connection.
+        """
+        opened = sent = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                opened += pool.num_connections
+                sent += pool.num_requests
+        return {'requests': sent, 'opened': opened, 'reused': sent - opened}
 
     def create_soup(self, link=None):
         """
@@ -87,8 +195,9 @@ class WebScrapper(object):
             link = self.source_url
         downloadable = self.download(link)
         print('I am creating soup for', link)
-        self.soup = bs.BeautifulSoup(downloadable, 'lxml')
-        return self.soup
+        soup = bs.BeautifulSoup(downloadable, 'lxml')
+        self.soup = soup
+        return soup
 
     def web_crawler(self, link, regex=None):
         """
@@ -104,28 +213,30 @@ class WebScrapper(object):
         --------------------------
         A dict. Key is the name of the links and value is the URL.
         """
-        with requests.Session() as s:
-            req = Request('GET', link, headers=HEADERS)
-            s.prepare_request(req)
-            s.get(link, cookies={'from-my': 'browser'})
-            req = s.get(link)
-            soup_object = bs.BeautifulSoup(req.text, 'lxml')
-            print(soup_object.find("div", {"id": "mainResults"}).find_all("h2")[0].text)
-            # Start page
-            start_page = soup_object.a
-            start_page = start_page['href']
-            links = {}
-            if regex:
-                for link, url in zip(soup_object.find_all('a', href=re.compile(regex)),
-                                     soup_object.find_all('div', {'class': 'info'})):
-                    page = start_page + link.get('href')
-                    name = url.h3.text
-                    links[name] = page
-            else:
-                for url in soup_object.find_all('a'):
-                    links.append(start_page + url.get('href'))
-            time.sleep(2)
-        return links
+        self.rate_limiter.wait()
+        return self.parse_links(self._request_page(link), regex)
+
+    def _request_page(self, link):
+        """Requests a page of the inspectorate and returns its HTML."""
+        response = self._get(link)
+        response.raise_for_status()
+        return response.content
+
+    def parse_links(self, html, regex=None):
+        """
+        Extracts the links of a results page, see web_crawler.
+
+        Parameters
+        -------------------------
+        html: str. The HTML of the page.
+        regex: str. A regular expression that can be used as a search key.
+
+        Returns
+        --------------------------
+        A dict. Key is the name of the links and value is the URL.
+        """
+        with self.telemetry.stage('parse'):
+            return page_parser.parse_links(html, regex)
 
     def web_access(self, link):
         """
@@ -138,32 +249,157 @@ class WebScrapper(object):
         --------------------------
         A dict. Key is the name of the program that we are interested to and as value the info that we would like
         to include.
+        Raises
+        --------------------------
+        DownloadError: If the page could not be downloaded, in which case it is not sent to the browser.
+        """
+        self.rate_limiter.wait()
+        return self._access_page(link)
+
+    def _access_page(self, link):
+        """The work of web_access without waiting for the rate limiter."""
+        loaded = None
+        if self.extraction == 'http' or self.fingerprints is not None:
+            loaded = self.load_page(link)
+        if self.fingerprints is not None:
+            fingerprint = page_parser.fingerprint(*loaded)
+            previous = self.fingerprints.unchanged(link, fingerprint)
+            if previous is not None:
+                print('The page did not change since the last crawl:', link)
+                self.telemetry.count('unchanged')
+                self.telemetry.count('pages')
+                return previous
+        scrapped_data = None
+        if self.extraction == 'http':
+            scrapped_data = self.extract_http(link, loaded)
+            if not scrapped_data:
+                print('No programs found without a browser, falling back to the browser for', link)
+        if not scrapped_data:
+            scrapped_data = self.extract_browser(link, loaded[0] if loaded else None)
+        to_write, removed = scrapped_data, []
+        if self.fingerprints is not None:
+            delta = self.fingerprints.delta(link, scrapped_data)
+            to_write, removed = dict(delta['added'], **delta['changed']), delta['removed']
+        if self.write and (to_write or removed):
+            # One append and fsync for all the programs of the page
+            with self._write_lock, self.telemetry.stage('persist', url=link, programs=len(to_write)):
+                if self.results_format == 'arrow':
+                    # A partition holds all the programs of its page
+                    self.openfile.write(link, scrapped_data)
+                else:
+                    with self.openfile:
+                        self.openfile.update(to_write)
+                        if removed:
+                            self._remove_programs(removed, loaded[0])
+        if self.fingerprints is not None:
+            # Only once the programs are persisted, so that a crash before does not mark the page as unchanged
+            self.fingerprints.record(link, fingerprint, scrapped_data)
+            self._write_delta(delta)
+        self.telemetry.count('pages')
+        return scrapped_data
+
+    def _remove_programs(self, codes, company):
+        """Removes the programs that a school no longer offers from the results file."""
+        for code in codes:
+            # The codes are the keys of the results file, which the schools share: only the program of this school
+            # is removed
+            if _institute(self.openfile.get(code)) == company:
+                del self.openfile[code]
+
+    def _write_delta(self, delta):
+        if not (delta['added'] or delta['changed'] or delta['removed']):
+            return
+        line = json.dumps(delta) + '\n'
+        with self._write_lock:
+            with open(DELTA_OUTPUT, 'a') as fh:
+                fh.write(line)
+
+    def load_page(self, link):
         """
-        soup_object = self.create_soup(link)
-        # The name of the company
-        company = soup_object.find('h1', {'class': 'heading'}).text
+        Downloads a school page and the content of its second tab, which is either part of the page or loaded from
+        the URL of its link.
+
+        Parameters
+        -------------------------
+        link: str. The page of the school.
+
+        Returns
+        --------------------------
+        tuple: The name of the school and the lxml element of the tab, None if the tab could not be found.
+
+        Raises
+        --------------------------
+        DownloadError: If the page or its tab could not be downloaded. The browser would not get them either.
+        """
+        html = self._download_page(link)
+        with self.telemetry.stage('parse', url=link):
+            page = page_parser.parse_html(html)
+            company = page_parser.COMPANY(page)
+            tab_links = page_parser.TAB_LINK(page)
         print('The name of the company is:', company)
-        browser = self._browser
-        browser.visit(link)
-        # Navigate the browser using x-path of the page element
-        click_button_xpath = '//*[@id="tabs"]/ul/li[2]'  # based on the xpath
-        click_button = browser.find_by_xpath(click_button_xpath)[0]
-        click_button.click()
-        # We will search for the info we need using the x-path and css syntax
-        search_results_xpath = '//*[@class="remote-accordion ui-accordion ui-widget ui-helper-reset"]'
-        search_results = browser.find_by_xpath(search_results_xpath)
-        find_h = browser.find_by_css('div[class="l-1of4"]')
+        if not tab_links:
+            return company, None
+        tab_link = tab_links[0]
+        if tab_link.startswith('#'):
+            tabs = page.xpath('//*[@id=$id]', id=tab_link[1:])
+            return company, tabs[0] if tabs else None
+        tab_html = self._download_page(urljoin(link, tab_link))
+        with self.telemetry.stage('parse', url=link):
+            return company, page_parser.parse_html(tab_html)
+
+    def _download_page(self, link):
+        """Downloads a page like download, but raises a DownloadError instead of returning None."""
+        html = self.download(link)
+        if not html:
+            raise DownloadError('Could not download {}'.format(link))
+        return html
+
+    def extract_http(self, link, loaded=None):
+        """
+        Extracts the programs of a school page without a browser. The page and its second tab are parsed with
+        lxml.
+
+        Parameters
+        -------------------------
+        link: str. The page of the school.
+        loaded: tuple, default None. The result of load_page if it was already called.
+
+        Returns
+        --------------------------
+        A dict like the one of web_access, empty if the tab or its programs could not be found.
+        """
+        company, tab = loaded or self.load_page(link)
+        if tab is None:
+            return {}
+        with self.telemetry.stage('parse', url=link):
+            return page_parser.parse_programs(tab, company)
+
+    def extract_browser(self, link, company=None):
+        """
+        Extracts the programs of a school page by clicking its second tab in the browser, see web_access. The name
+        of the school is read from the page unless it is given.
+        """
+        if company is None:
+            html = self._download_page(link)
+            with self.telemetry.stage('parse', url=link):
+                company = page_parser.COMPANY(page_parser.parse_html(html))
+            print('The name of the company is:', company)
         scrapped_data = {}
-        for search_result, label in zip(search_results, find_h):
-            title = search_result.text
-            label = label.text
-            splited = title.split()
-            scrapped_data[splited[0]] = {'institute': company, 'label': label, 'Details': splited[1:3]}
-        if self.write:
-            for key, value in scrapped_data.items():
-                self.openfile[key] = value
-        # Necessary in order to mimic a human behavior
-        time.sleep(3)
+        with self.telemetry.stage('browser', url=link), self.browser_pool.browser() as browser:
+            browser.visit(link)
+            # Navigate the browser using x-path of the page element
+            click_button_xpath = '//*[@id="tabs"]/ul/li[2]'  # based on the xpath
+            click_button = browser.find_by_xpath(click_button_xpath)[0]
+            click_button.click()
+            # We will search for the info we need using the x-path and css syntax
+            search_results_xpath = '//*[@class="remote-accordion ui-accordion ui-widget ui-helper-reset"]'
+            search_results = browser.find_by_xpath(search_results_xpath)
+            find_h = browser.find_by_css('div[class="l-1of4"]')
+            for search_result, label in zip(search_results, find_h):
+                title = search_result.text
+                label = label.text
+                splited = title.split()
+                scrapped_data[splited[0]] = {'institute': company, 'label': label, 'Details': splited[1:3]}
         return scrapped_data
 
     def next_page(self, url):
@@ -179,29 +415,151 @@ class WebScrapper(object):
         Todo:
             *Extract the url of the next page using info from the start page.
         """
-        with requests.Session() as s:
-            req = Request('GET', url, headers=HEADERS)
-            s.prepare_request(req)
-            # s.get(url_2, cookies={'from-my': 'browser'})
-            s.get(url, cookies={'from-my': 'browser'})
-            req = s.get(url)
-            soup = bs.BeautifulSoup(req.text, 'lxml')
-            next_page = []
-            next_page_number = None
-            for page in soup.find_all('a', text=['Inspectie van het Onderwijs', 'Zoek en vergelijk']):
-                next_page.append(page['href'])
-            for page in soup.find_all('li', {'class': ['pager', 'next']}):
-                next_page_number = int(page.a['href'][-1])
-            try:
-                assert (isinstance(int(next_page_number), int))
-            except (AssertionError, TypeError, ValueError) as e:
-                print('Problem in the next page function')
-            print('Next page is:{}'.format(next_page_number))
-            next_url = 'https://www.zoekscholen.onderwijsinspectie.nl/zoek-en-vergelijk?searchtype=generic&zoekterm=&pagina='  # noqa
-            next_page = next_url + str(next_page_number) + '&filterSectoren=BVE'
-            print(next_page)
+        self.rate_limiter.wait()
+        return self.parse_next_page(self._request_page(url))
+
+    def parse_next_page(self, html):
+        """
+        Extracts the next page from the HTML of a results page, see next_page.
+        """
+        with self.telemetry.stage('parse'):
+            next_page_number = page_parser.parse_next_page_number(html)
+        try:
+            assert (isinstance(int(next_page_number), int))
+        except (AssertionError, TypeError, ValueError) as e:
+            print('Problem in the next page function')
+        print('Next page is:{}'.format(next_page_number))
+        next_page = RESULTS_PAGE.format(next_page_number)
+        print(next_page)
         return next_page, next_page_number
 
+    @staticmethod
+    def plan_pages(html):
+        """
+        Plans all the result pages from the first one, using the total number of results in its title.
+
+        Parameters
+        -------------------------
+        html: str. The HTML of the first results page.
+
+        Returns
+        --------------------------
+        list: The URLs of all the result pages, the first one included.
+        """
+        total, per_page = page_parser.parse_result_count(html)
+        if not total or not per_page:
+            return [RESULTS_PAGE.format(1)]
+        pages = -(-total // per_page)
+        return [RESULTS_PAGE.format(number) for number in range(1, pages + 1)]
+
+    def crawl_all_pages(self, url=None, regex=None, workers=4):
+        """
+        Crawls all the result pages at once instead of following the next page links one by one. The first page
+        tells how many pages there are, the other ones are then crawled concurrently by ``workers`` requests.
+
+        Parameters
+        -------------------------
+        url: str, default None. The first results page, if None the URL passed in the constructor is used.
+        regex: str. A regular expression that can be used as a search key, see web_crawler.
+        workers: int, default 4. The number of pages requested at the same time.
+
+        Returns
+        --------------------------
+        A dict. Key is the name of the links of all the pages and value is the URL. A page that fails does not
+        lose the links of the other ones: it is left out and recorded in failed_pages with its error.
+        """
+        url = url or self.source_url
+        self.rate_limiter.wait()
+        first_page = self._request_page(url)
+        links = self.parse_links(first_page, regex)
+        pages = self.plan_pages(first_page)[1:]
+        print('Crawling {} more result pages'.format(len(pages)))
+        crawler = AsyncCrawler(self, max_per_host=workers)
+        try:
+            links.update(crawler.web_crawler(pages, regex))
+            self.failed_pages = crawler.failed
+        finally:
+            crawler.close()
+        if self.failed_pages:
+            print('{} of {} result pages could not be crawled, see failed_pages'.format(
+                len(self.failed_pages), len(pages)))
+        return links
+
+    def crawl(self, frontier, url=None, regex=None):
+        """
+        Crawls all the result pages and then all the school pages, recording the progress in a frontier. Every page
+        is checkpointed once it is done, so calling this method again after a crash resumes the crawl where it
+        stopped. School pages found on several result pages are only scraped once.
+
+        Parameters
+        -------------------------
+        frontier: CrawlFrontier. The persistent state of the crawl.
+        url: str, default None. The first results page, if None the URL passed in the constructor is used.
+        regex: str. A regular expression that can be used as a search key, see web_crawler.
+
+        Returns
+        --------------------------
+        A dict with the number of school pages in every state. The retries spent by the crawl are given by
+        retry_stats.
+        """
+        self.retry_policy.reset_stats()
+        frontier.resume()
+        if not any(frontier.counts('results').values()):
+            url = url or self.source_url
+            self.rate_limiter.wait()
+            first_page = self._request_page(url)
+            frontier.add(self.parse_links(first_page, regex).values(), kind='school')
+            frontier.add([url], kind='results')
+            frontier.done(url)
+            frontier.add(self.plan_pages(first_page)[1:], kind='results')
+        for kind, visit in (('results', lambda page: frontier.add(self.web_crawler(page, regex).values())),
+                            ('school', self.web_access)):
+            while True:
+                claimed = frontier.claim(kind)
+                if not claimed:
+                    break
+                page = claimed[0]
+                try:
+                    visit(page)
+                except CircuitOpenError as e:
+                    # The host is failing, not the page: pause until the circuit lets a request through again,
+                    # without spending an attempt of the page
+                    frontier.release(page)
+                    print('Pausing the crawl for {:.0f}s: {}'.format(e.retry_after, e))
+                    time.sleep(e.retry_after)
+                except Exception as e:
+                    print('Problem with', page, e)
+                    frontier.failed(page, e)
+                else:
+                    frontier.done(page)
+        return frontier.counts('school')
+
+    @staticmethod
+    def create_session(pool_size=10):
+        """
+        Creates the session shared by all the requests of the scrapper. The session keeps the connections alive,
+        sends the headers of a browser and keeps the cookies of the inspectorate between pages.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        # requests sets the Host header of every URL itself
+        session.headers.update({key: value for key, value in HEADERS.items() if key != 'Host'})
+        session.cookies.set('from-my', 'browser')
+        return session
+
+    def close(self):
+        """Closes the results file, the connections of the session, the browsers and the telemetry."""
+        if self.write:
+            # Commits and fsyncs the lines written outside a batch
+            self.openfile.close()
+        self.session.close()
+        self.browser_pool.close()
+        self.telemetry.close()
+        if self.fingerprints is not None:
+            self.fingerprints.close()
+
     @staticmethod
     def create_browser():
         """
@@ -0,0 +1,201 @@
+"""
+Distributed crawl workers sharing one frontier.
+
+A coordinator owns the crawl frontier and the results file. It serves a task queue and a result queue through a
+``multiprocessing`` manager, which plays the role of the broker: workers on the same host or on other hosts connect
+to it with its address and authentication key. Every worker takes school pages from the task queue, extracts their
+programs with ``WebScrapper.web_access`` and sends them back. The coordinator is the single writer of the results,
+so the workers never compete for the results file.
+
+Usage
+-----
+    python workers.py coordinator --workers 4
+    python workers.py worker --address coordinator-host:50000
+"""
+import argparse
+import multiprocessing
+import queue
+import time
+from multiprocessing.managers import BaseManager
+
+from frontier import CrawlFrontier
+from results_store import ResultsWriter
+from retry import CircuitOpenError
+from utils import ConfigDict
+from web_scrapper import RESULTS_DIRECTORY, RESULTS_OUTPUT, WebScrapper
+
+DEFAULT_ADDRESS = ('127.0.0.1', 50000)
+DEFAULT_AUTHKEY = b'mbo-crawl'
+
+_tasks = queue.Queue()
+_results = queue.Queue()
+
+
+def _get_tasks():
+    return _tasks
+
+
+def _get_results():
+    return _results
+
+
+class CrawlBroker(BaseManager):
+    """The manager that serves the task and result queues to the workers."""
+
+
+CrawlBroker.register('tasks', callable=_get_tasks)
+CrawlBroker.register('results', callable=_get_results)
+
+
+class BrokerClient(BaseManager):
+    """The connection of a worker to the CrawlBroker."""
+
+
+BrokerClient.register('tasks')
+BrokerClient.register('results')
+
+
+def run_worker(address=DEFAULT_ADDRESS, authkey=DEFAULT_AUTHKEY, rate=0.4, **scrapper_options):
+    """
+    Extracts school pages from the task queue of a broker until it receives a stop signal (None).
+
+    Parameters
+    ----------
+    address : tuple
+        The host and port of the broker.
+    authkey : bytes
+        The authentication key of the broker.
+    rate : float
+        The number of pages per second requested by this worker.
+    scrapper_options
+        Other arguments of the WebScrapper, e.g. ``extraction`` or ``cache``.
+    """
+    client = BrokerClient(address=address, authkey=authkey)
+    client.connect()
+    tasks, results = client.tasks(), client.results()
+    scrapper = WebScrapper(None, write=False, rate=rate, **scrapper_options)
+    try:
+        while True:
+            url = tasks.get()
+            if url is None:
+                break
+            while True:
+                try:
+                    results.put((url, scrapper.web_access(url), None))
+                except CircuitOpenError as e:
+                    # The host is failing, not the page: keep it and try again once the circuit lets it through
+                    print('Pausing the worker for {:.0f}s: {}'.format(e.retry_after, e))
+                    time.sleep(e.retry_after)
+                    continue
+                except Exception as e:
+                    results.put((url, None, repr(e)))
+                break
+    finally:
+        scrapper.close()
+
+
+def run_coordinator(frontier, workers=4, address=DEFAULT_ADDRESS, authkey=DEFAULT_AUTHKEY, local_workers=None,
+                    output=None, rate=0.4, prefetch=2, task_timeout=600, results_format='text'):
+    """
+    Serves the pending school pages of a frontier to the workers and writes their results.
+
+    Parameters
+    ----------
+    frontier : CrawlFrontier
+        The crawl to run. Its result pages should already be crawled, see ``WebScrapper.crawl``.
+    workers : int, default 4
+        The number of workers that take part in the crawl. Each one receives a stop signal at the end.
+    address : tuple
+        The host and port on which the broker listens. Use ('', port) to accept workers of other hosts.
+    authkey : bytes
+        The authentication key of the broker.
+    local_workers : int, default None
+        The number of workers started as processes of this host. If None, all the workers are local.
+    output : str
+        The results file, written with a ConfigDict, or the results directory with ``results_format='arrow'``.
+        By default the ones of the WebScrapper.
+    rate : float, default 0.4
+        The total number of pages per second for the host of the inspectorate, shared among the workers.
+    prefetch : int, default 2
+        The number of pages queued per worker, so that the workers never wait for the coordinator.
+    task_timeout : float, default 600
+        Stop when no result arrives for this number of seconds, e.g. because the workers died. The pages in flight
+        stay in the frontier and are served again by the next run.
+    results_format : str, default 'text'
+        'text' or 'arrow', see WebScrapper.
+
+    Returns
+    -------
+    dict
+        The number of school pages in every state.
+    """
+    broker = CrawlBroker(address=address, authkey=authkey)
+    broker.start()
+    local_workers = workers if local_workers is None else local_workers
+    processes = [multiprocessing.Process(target=run_worker, args=(broker.address, authkey, rate / workers))
+                 for _ in range(local_workers)]
+    for process in processes:
+        process.start()
+    tasks, results = broker.tasks(), broker.results()
+    if results_format == 'arrow':
+        store = ResultsWriter(output or RESULTS_DIRECTORY)
+    else:
+        store = ConfigDict(output or RESULTS_OUTPUT)
+    frontier.resume()
+    in_flight = 0
+    try:
+        while True:
+            for url in frontier.claim('school', limit=workers * prefetch - in_flight):
+                tasks.put(url)
+                in_flight += 1
+            if not in_flight:
+                break
+            try:
+                url, scrapped_data, error = results.get(timeout=task_timeout)
+            except queue.Empty:
+                print('No result from the workers for {} seconds, stopping'.format(task_timeout))
+                break
+            in_flight -= 1
+            if error is not None:
+                print('Problem with', url, error)
+                frontier.failed(url, error)
+                continue
+            if results_format == 'arrow':
+                store.write(url, scrapped_data)
+            else:
+                store.update(scrapped_data)
+            frontier.done(url)
+    finally:
+        for _ in range(workers):
+            tasks.put(None)
+        for process in processes:
+            process.join()
+        store.close()
+        # Let the remote workers read their stop signal before the broker goes away
+        time.sleep(1)
+        broker.shutdown()
+    return frontier.counts('school')
+
+
+def _address(value):
+    host, port = value.rsplit(':', 1)
+    return host, int(port)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Distributed crawl of the school pages')
+    parser.add_argument('role', choices=['coordinator', 'worker'])
+    parser.add_argument('--address', type=_address, default=DEFAULT_ADDRESS, help='host:port of the broker')
+    parser.add_argument('--authkey', default=DEFAULT_AUTHKEY.decode())
+    parser.add_argument('--frontier', default='crawl_frontier.db')
+    parser.add_argument('--workers', type=int, default=4, help='total number of workers')
+    parser.add_argument('--local-workers', type=int, default=None, help='workers started by the coordinator')
+    parser.add_argument('--results-format', choices=['text', 'arrow'], default='text')
+    parser.add_argument('--rate', type=float, default=0.4,
+                        help='pages per second, in total for the coordinator and per worker for a worker')
+    args = parser.parse_args()
+    if args.role == 'coordinator':
+        print(run_coordinator(CrawlFrontier(args.frontier), args.workers, args.address, args.authkey.encode(),
+                              args.local_workers, rate=args.rate, results_format=args.results_format))
+    else:
+        run_worker(args.address, args.authkey.encode(), args.rate)